@@ -0,0 +1,238 @@
+import pandas as pd
+import contextlib
+import json
+import os
+import threading
+from datetime import datetime
+from config import get_setting, process_singleton
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+# ========================================
+# JSONL HELPERS
+# ========================================
+
+def read_jsonl_since(path, offset):
+    """Read complete JSON lines appended to a file after a byte offset.
+
+    Returns (records, new_offset). A trailing partial line is left for the next
+    call, and malformed lines are skipped.
+    """
+    if not os.path.exists(path):
+        return [], offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    data = data[:data.rfind(b"\n") + 1]
+    records = []
+    for line in data.splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records, offset + len(data)
+
+def append_jsonl(path, records):
+    """Append records to a JSONL file in a single write"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive OS lock on a sidecar `<path>.lock` file across processes"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+# ========================================
+# ACTIVITY EVENT LOG
+# ========================================
+
+SYNC_USER = "sheet-sync"
+
+class ActivityLog:
+    """Append-only JSONL log of dashboard mutations and detected sheet changes.
+
+    Events are indexed in memory by kind, user and subject (Donor ID / Task ID),
+    so feed and history queries never touch Sheets or rescan the file. Once the
+    file holds more than twice `max_events` lines it is compacted down to the
+    newest `max_events`. Appends and compaction hold a file lock, so workers
+    never append to a file another worker is replacing.
+    """
+
+    def __init__(self, path, max_events=50000):
+        self.path = path
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._sheet_state = {}  # source -> {row key: row hash} from the last sync
+        self._reset()
+
+    def _reset(self):
+        self._events = []
+        self._ids = set()
+        self._by_kind = {}
+        self._by_user = {}
+        self._by_subject = {}
+        self._offset = 0
+        self._inode = None
+
+    def _index(self, event):
+        pos = len(self._events)
+        self._events.append(event)
+        if event.get("id"):
+            self._ids.add(event["id"])
+        self._by_kind.setdefault(event["kind"], []).append(pos)
+        for user in self._users(event):
+            self._by_user.setdefault(user, []).append(pos)
+        for subject in event.get("subjects", []):
+            self._by_subject.setdefault(str(subject), []).append(pos)
+
+    def _catch_up(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # First read, or another process compacted the file: reload it
+            self._reset()
+            self._inode = stat.st_ino
+        records, self._offset = read_jsonl_since(self.path, self._offset)
+        for event in records:
+            self._index(event)
+
+    def _compact(self):
+        keep = self._events[-self.max_events:]
+        tmp_path = f"{self.path}.compact"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(event, default=str) + "\n" for event in keep))
+        os.replace(tmp_path, self.path)
+        self._reset()
+        self._catch_up()
+
+    def append(self, events):
+        """Append events, skipping any whose id was already logged"""
+        with self._lock, file_lock(self.path):
+            self._catch_up()
+            events = [e for e in events if not e.get("id") or e["id"] not in self._ids]
+            if not events:
+                return
+            append_jsonl(self.path, events)
+            self._catch_up()
+            if len(self._events) > 2 * self.max_events:
+                self._compact()
+
+    def record(self, kind, actor, subjects=(), details=None):
+        """Log one event"""
+        self.append([{
+            "ts": datetime.now().isoformat(),
+            "kind": kind,
+            "actor": actor,
+            "subjects": [str(s) for s in subjects],
+            "details": details or {},
+        }])
+
+    def record_sheet_deltas(self, source, df, key_col):
+        """Diff a freshly loaded sheet against the last one and log added/changed/removed rows.
+
+        Sync events get deterministic ids, so several workers noticing the same
+        change only log it once.
+        """
+        if df.empty or key_col not in df.columns:
+            return
+        hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+        current = dict(zip(df[key_col].astype(str), hashes.astype(str)))
+
+        with self._lock:
+            previous = self._sheet_state.get(source)
+            self._sheet_state[source] = current
+        if previous is None:
+            return  # first load in this process is the baseline
+
+        events = []
+        now = datetime.now().isoformat()
+        for key, row_hash in current.items():
+            if key not in previous:
+                kind = "added"
+            elif previous[key] != row_hash:
+                kind = "changed"
+            else:
+                continue
+            events.append({"ts": now, "kind": f"{source}_row_{kind}", "actor": SYNC_USER,
+                           "subjects": [key], "details": {}, "id": f"{source}:{key}:{previous.get(key, '')}:{row_hash}"})
+        for key in previous.keys() - current.keys():
+            events.append({"ts": now, "kind": f"{source}_row_removed", "actor": SYNC_USER,
+                           "subjects": [key], "details": {}, "id": f"{source}:{key}:{previous[key]}:removed"})
+        self.append(events)
+
+    @staticmethod
+    def _users(event):
+        return {event.get("actor"), event.get("details", {}).get("assignedTo")} - {None, ""}
+
+    def query(self, kind=None, user=None, subject=None, limit=100):
+        """Newest-first events matching every given filter"""
+        filters = [(self._by_kind, kind), (self._by_user, user), (self._by_subject, subject)]
+        with self._lock:
+            self._catch_up()
+            # Walk the shortest matching posting list and check the other filters per event
+            postings = [index.get(value, []) for index, value in filters if value is not None]
+            positions = min(postings, key=len) if postings else range(len(self._events))
+
+            results = []
+            for pos in reversed(positions):
+                event = self._events[pos]
+                if (kind is None or event["kind"] == kind) and \
+                        (user is None or user in self._users(event)) and \
+                        (subject is None or subject in event.get("subjects", [])):
+                    results.append(event)
+                    if len(results) == limit:
+                        break
+            return results
+
+    def kinds(self):
+        with self._lock:
+            self._catch_up()
+            return sorted(self._by_kind)
+
+    def users(self):
+        with self._lock:
+            self._catch_up()
+            return sorted(self._by_user)
+
+@process_singleton
+def get_activity_log():
+    """Get the process-wide activity log"""
+    return ActivityLog(get_setting("ACTIVITY_LOG_PATH", "data/activity_log.jsonl"))
+
+def record_event(kind, actor, subjects=(), details=None):
+    """Log a dashboard mutation; logging failures never block the mutation itself"""
+    try:
+        get_activity_log().record(kind, actor, subjects, details)
+    except Exception:
+        pass
+
+def record_sheet_deltas(source, df, key_col):
+    """Log rows that changed in a sheet since this process last loaded it"""
+    try:
+        get_activity_log().record_sheet_deltas(source, df, key_col)
+    except Exception:
+        pass
+
+def events_frame(events):
+    """Flatten events into a table for display"""
+    return pd.DataFrame([{
+        "Time": event["ts"][:19].replace("T", " "),
+        "Event": event["kind"].replace("_", " ").title(),
+        "User": event.get("actor", ""),
+        "Subject": ", ".join(event.get("subjects", [])[:5]) + (" …" if len(event.get("subjects", [])) > 5 else ""),
+    } for event in events])
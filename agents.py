@@ -0,0 +1,101 @@
+import streamlit as st
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from profiling import profile_active
+
+# ========================================
+# AGENT REGISTRY
+# ========================================
+# Each agent module registers itself on import: its data sources, a status
+# probe, and the headline metrics it contributes to the overview. The modules
+# are listed in AGENT_MODULES and imported by load_agents(). Pages ask for
+# sources by name and read the results from what load_sources returns, so a
+# new agent's status card and overview metrics need only its module and its
+# entry in AGENT_MODULES; pages of its own are still added in dashboard.py.
+
+AGENT_MODULES = ["daphne", "diana", "opsi"]
+
+# Seconds a worker reuses a sheet frame before re-reading the shared cache.
+# Kept well below DAPHNE_TTL / OPSI_TTL, so data is at most that much older
+# than the shared entry; frames re-read from an unchanged entry keep their
+# snapshot id, so indexes built on them are not rebuilt.
+LOCAL_CACHE_TTL = 15
+
+class DataSource:
+    """A named loader whose result panels read by name.
+
+    `ttl` is the source's per-worker cache policy: register() puts `load`
+    behind st.cache_data(ttl=ttl). Sources that cache themselves (e.g. the
+    outreach store's poll interval) leave it None.
+    """
+
+    def __init__(self, name, load, ttl=None):
+        self.name = name
+        self.fetch = load
+        self.ttl = ttl
+        self.load = load
+
+class Agent:
+    """One agent's card, status probe, data sources and metrics"""
+
+    def __init__(self, key, name, icon, description, status, sources=(), metrics=None, metric_sources=None):
+        self.key = key
+        self.name = name
+        self.icon = icon
+        self.description = description
+        self.status = status
+        self.sources = list(sources)
+        # metrics(data) -> {label: value}, computed from the loaded sources named in metric_sources
+        self.metrics = metrics
+        self.metric_sources = metric_sources if metric_sources is not None else [s.name for s in self.sources]
+
+AGENTS = {}
+SOURCES = {}
+_lock = threading.Lock()
+
+def register(agent):
+    """Add an agent (and its data sources) to the registry"""
+    with _lock:
+        AGENTS[agent.key] = agent
+        for source in agent.sources:
+            if source.ttl is not None:
+                source.load = st.cache_data(ttl=source.ttl)(source.fetch)
+            SOURCES[source.name] = source
+    return agent
+
+def get_agents():
+    """Registered agents in registration order"""
+    return list(AGENTS.values())
+
+def load_agents():
+    """Import every module in AGENT_MODULES (each registers itself) and return the agents"""
+    for module in AGENT_MODULES:
+        importlib.import_module(module)
+    return get_agents()
+
+def metric_sources():
+    """Every source the agents' headline metrics need"""
+    return [name for agent in get_agents() if agent.metrics for name in agent.metric_sources]
+
+def load_sources(names):
+    """Load the named data sources in parallel and return {name: result}.
+
+    Worker threads carry this rerun's script context, so cached loaders and
+    any st.error they raise behave as if called inline. While a page profile
+    is capturing the sources load inline instead, since cProfile only sees the
+    script thread.
+    """
+    names = list(dict.fromkeys(names))
+    if len(names) < 2 or profile_active():
+        return {name: SOURCES[name].load() for name in names}
+
+    ctx = get_script_run_ctx()
+
+    def load(name):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return SOURCES[name].load()
+
+    with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="source") as pool:
+        return dict(zip(names, pool.map(load, names)))
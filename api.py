@@ -0,0 +1,143 @@
+"""Local HTTP API over the data layer, for scripts that shouldn't drive the UI.
+
+    GET  /leads?search=&status=&org_type=&email_domain=&limit=
+    GET  /tasks?search=&status=&assigned=&overdue=1&due_within=7&limit=
+    GET  /metrics
+    POST /leads/approve     body: Donor IDs as JSON lines ({"donor_id": ...}) or one per line
+    POST /tasks/create      body: task payloads as JSON lines
+    POST /tasks/update      body: update payloads as JSON lines (each with "taskId")
+    POST /refresh           drop shared cached sheets
+
+Responses are application/x-ndjson and stream as rows are produced. Set the
+OPS_API_TOKEN setting to require "Authorization: Bearer <token>".
+
+    python cli.py serve --port 8765
+"""
+
+import json
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import core
+from config import get_setting
+
+def _flag(value):
+    return value is not None and value.lower() in ("1", "true", "yes")
+
+def _int(value):
+    return int(value) if value not in (None, "") else None
+
+class OpsRequestHandler(BaseHTTPRequestHandler):
+    server_version = "OpsAPI/1.0"
+
+    def _authorized(self):
+        token = get_setting("OPS_API_TOKEN")
+        if not token:
+            return True
+        return hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {token}")
+
+    def _start(self, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+    def _write(self, text):
+        self.wfile.write(text.encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_records(self, records, status=200):
+        self._start(status)
+        for record in records:
+            self._write(json.dumps(record, default=str) + "\n")
+
+    def _send_frame(self, df):
+        self._start()
+        for chunk in core.iter_json_lines(df):
+            self._write(chunk)
+
+    def _body_records(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return core.read_json_lines(self.rfile.read(length).decode("utf-8").splitlines())
+
+    def _handle(self, routes):
+        if not self._authorized():
+            self._send_records([{"error": "unauthorized"}], 401)
+            return
+        url = urlparse(self.path)
+        route = routes.get(url.path.rstrip("/"))
+        if route is None:
+            self._send_records([{"error": f"no route {url.path}"}], 404)
+            return
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            route(params)
+        except (ValueError, KeyError) as e:
+            self._send_records([{"error": f"bad request: {e}"}], 400)
+        except core.OpsError as e:
+            self._send_records([{"error": str(e)}], 502)
+
+    def do_GET(self):
+        self._handle({
+            "/leads": self.get_leads,
+            "/tasks": self.get_tasks,
+            "/metrics": self.get_metrics,
+        })
+
+    def do_POST(self):
+        self._handle({
+            "/leads/approve": self.approve_leads,
+            "/tasks/create": self.create_tasks,
+            "/tasks/update": self.update_tasks,
+            "/refresh": self.refresh,
+        })
+
+    # ---- routes ----
+
+    def get_leads(self, params):
+        self._send_frame(core.query_leads(
+            params.get("search"), params.get("status"), _int(params.get("limit")),
+            org_type=params.get("org_type"), email_domain=params.get("email_domain"),
+        ))
+
+    def get_tasks(self, params):
+        self._send_frame(core.query_tasks(
+            params.get("search"), params.get("status"), params.get("assigned"),
+            overdue=_flag(params.get("overdue")), due_within=_int(params.get("due_within")),
+            limit=_int(params.get("limit")),
+        ))
+
+    def get_metrics(self, params):
+        self._send_records([core.summary_metrics()])
+
+    def approve_leads(self, params):
+        records = self._body_records()
+        donor_ids = [record.get("donor_id", record.get("Donor ID", record.get("id"))) for record in records]
+        if None in donor_ids:
+            raise ValueError("each line needs a donor_id")
+        self._send_records([core.approve_leads(donor_ids, params.get("by", "Ops API"))])
+
+    def create_tasks(self, params):
+        self._send_records(core.create_tasks(self._body_records(), params.get("by", "Ops API")))
+
+    def update_tasks(self, params):
+        updates = self._body_records()
+        if any("taskId" not in update for update in updates):
+            raise ValueError("each update needs a taskId")
+        self._send_records(core.update_tasks(updates, params.get("by", "Ops API")))
+
+    def refresh(self, params):
+        core.invalidate_data()
+        self._send_records([{"success": True}])
+
+def serve(host="127.0.0.1", port=8765):
+    """Run the API until interrupted"""
+    core.warm_up_sheets()
+    server = ThreadingHTTPServer((host, port), OpsRequestHandler)
+    print(f"Ops API listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,107 @@
+"""Command-line access to the data layer; every command prints JSON lines.
+
+    python cli.py leads --search church --limit 20
+    python cli.py leads --org-type School --email-domain example.org
+    python cli.py tasks --overdue
+    python cli.py metrics
+    python cli.py approve DON-000123 DON-000456      # or Donor IDs on stdin
+    python cli.py create-tasks < tasks.jsonl
+    python cli.py update-tasks < updates.jsonl
+    python cli.py refresh
+    python cli.py serve --port 8765
+
+Settings come from the environment or .streamlit/secrets.toml, the same
+keys the dashboard reads. Loads go through the shared cache, so the CLI and
+the dashboard workers reuse each other's sheet fetches.
+"""
+
+import argparse
+import json
+import sys
+
+import core
+
+def print_records(records):
+    ok = True
+    for record in records:
+        ok = ok and record.get("success", True)
+        print(json.dumps(record, default=str), flush=True)
+    return ok
+
+def print_frame(df):
+    for chunk in core.iter_json_lines(df):
+        sys.stdout.write(chunk)
+    return True
+
+def stdin_records():
+    return core.read_json_lines(sys.stdin) if not sys.stdin.isatty() else []
+
+def run(args):
+    if args.command == "leads":
+        return print_frame(core.query_leads(args.search, args.status, args.limit, args.org_type, args.email_domain))
+    if args.command == "tasks":
+        return print_frame(core.query_tasks(args.search, args.status, args.assigned, args.overdue, args.due_within, args.limit))
+    if args.command == "metrics":
+        return print_records([core.summary_metrics()])
+    if args.command == "approve":
+        donor_ids = args.donor_ids or [r.get("donor_id", r.get("Donor ID", r.get("id"))) for r in stdin_records()]
+        return print_records([core.approve_leads([d for d in donor_ids if d is not None], args.by)])
+    if args.command == "create-tasks":
+        return print_records(core.create_tasks(stdin_records(), args.by))
+    if args.command == "update-tasks":
+        return print_records(core.update_tasks(stdin_records(), args.by))
+    if args.command == "refresh":
+        core.invalidate_data()
+        return print_records([{"success": True}])
+    if args.command == "serve":
+        from api import serve
+        serve(args.host, args.port)
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    leads = commands.add_parser("leads", help="list DAPHNE leads")
+    leads.add_argument("--search", help="match name, email or organization")
+    leads.add_argument("--status")
+    leads.add_argument("--org-type", choices=core.ORG_TYPES)
+    leads.add_argument("--email-domain", help="e.g. example.org")
+    leads.add_argument("--limit", type=int)
+
+    tasks = commands.add_parser("tasks", help="list OPSI tasks")
+    tasks.add_argument("--search", help="match title, assignee or task type")
+    tasks.add_argument("--status")
+    tasks.add_argument("--assigned")
+    deadline = tasks.add_mutually_exclusive_group()
+    deadline.add_argument("--overdue", action="store_true", help="open tasks past their deadline, oldest first")
+    deadline.add_argument("--due-within", type=int, metavar="DAYS", help="open tasks due in the next DAYS days")
+    tasks.add_argument("--limit", type=int)
+
+    commands.add_parser("metrics", help="lead, task and approval counts")
+
+    approve = commands.add_parser("approve", help="approve Donor IDs in one DIANA call")
+    approve.add_argument("donor_ids", nargs="*", help="Donor IDs (read from stdin when omitted)")
+    approve.add_argument("--by", default="Ops CLI", help="approver recorded in the ledger")
+
+    for name, help_text in [("create-tasks", "create OPSI tasks from JSON lines on stdin"),
+                            ("update-tasks", "apply OPSI task updates from JSON lines on stdin")]:
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--by", default="Ops CLI", help="actor recorded in the activity log")
+
+    commands.add_parser("refresh", help="drop shared cached sheets so the next load refetches")
+
+    serve = commands.add_parser("serve", help="run the local HTTP API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args()
+    try:
+        ok = run(args)
+    except core.OpsError as e:
+        print(json.dumps({"error": str(e)}), file=sys.stderr)
+        sys.exit(2)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import functools
+import os
+import threading
+import tomllib
+
+# ========================================
+# SETTINGS
+# ========================================
+# Inside the dashboard, settings come from st.secrets (utils registers it via
+# use_settings). Headless tools read environment variables first, then
+# .streamlit/secrets.toml in the working directory or the home directory,
+# the same files Streamlit itself reads.
+
+SECRETS_FILES = [
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+]
+
+_settings_source = None
+_file_settings = None
+
+def use_settings(source):
+    """Read settings from `source()` (a mapping, e.g. st.secrets) instead of env/secrets.toml"""
+    global _settings_source
+    _settings_source = source
+
+def _load_secrets_files():
+    global _file_settings
+    if _file_settings is None:
+        _file_settings = {}
+        for path in reversed(SECRETS_FILES):  # project file wins over the global one
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    _file_settings.update(tomllib.load(f))
+    return _file_settings
+
+def get_setting(key, default=None):
+    """Look up one setting, returning `default` when it isn't configured"""
+    if _settings_source is not None:
+        try:
+            source = _settings_source()
+            if key in source:
+                return source[key]
+        except Exception:
+            pass  # e.g. no secrets file; fall through to the environment
+    if key in os.environ:
+        return os.environ[key]
+    return _load_secrets_files().get(key, default)
+
+def require_setting(key):
+    """Look up a setting that must be configured"""
+    value = get_setting(key)
+    if value is None:
+        raise KeyError(f"Missing setting {key} (set it in secrets.toml or the environment)")
+    return value
+
+# ========================================
+# PROCESS-WIDE RESOURCES
+# ========================================
+
+def process_singleton(factory):
+    """Cache a zero-argument factory's result for the process, building it at most once.
+
+    The Streamlit-free counterpart of st.cache_resource: concurrent first
+    calls wait for one build, and a factory that raises is retried next call.
+    """
+    lock = threading.Lock()
+    built = []
+
+    @functools.wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+
+    get.clear = built.clear
+    return get
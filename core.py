@@ -0,0 +1,791 @@
+import pandas as pd
+import gspread
+from gspread.utils import rowcol_to_a1
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import AuthorizedSession, Request
+import requests
+from requests.adapters import HTTPAdapter
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from activity import read_jsonl_since, append_jsonl, record_event, record_sheet_deltas
+from config import get_setting, require_setting, process_singleton
+from shared_cache import shared_fetch, invalidate_shared
+
+# ========================================
+# DATA LAYER
+# ========================================
+# Loaders, filters, metrics and webhook senders with no Streamlit dependency.
+# utils.py wraps these for the dashboard (st.cache_data, st.error); cli.py
+# and api.py use them directly. Failures raise OpsError with a message fit
+# to show the user.
+
+class OpsError(Exception):
+    """A data-layer failure with a user-facing message"""
+
+# ========================================
+# GOOGLE SHEETS CONNECTION
+# ========================================
+
+SHEETS_SCOPES = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+CREDENTIAL_KEYS = [
+    "type", "project_id", "private_key_id", "private_key", "client_email", "client_id",
+    "auth_uri", "token_uri", "auth_provider_x509_cert_url", "client_x509_cert_url",
+]
+TOKEN_REFRESH_MARGIN = 300  # refresh the OAuth token this many seconds before it expires
+RECONNECT_BACKOFF = (1, 120)  # first and maximum retry delay in seconds
+WARMUP_WAIT = 15  # how long the very first request waits for the initial handshake
+HTTP_POOL_SIZE = 16
+
+class SheetsClientManager:
+    """Keeps one authorized gspread client ready in a background thread.
+
+    The thread does the auth handshake at startup, refreshes the token
+    before it expires and reconnects with exponential backoff after a
+    failure, so requests never pay auth latency and a failed start is
+    retried instead of cached. All requests share one pooled HTTP session.
+    """
+
+    def __init__(self, credentials_info):
+        self._credentials_info = credentials_info
+        self._client = None
+        self._credentials = None
+        self._token_request = Request(requests.Session())
+        self._failures = 0
+        self.last_error = None
+        self._first_attempt = threading.Event()
+        threading.Thread(target=self._run, name="sheets-client", daemon=True).start()
+
+    def _connect(self):
+        credentials = Credentials.from_service_account_info(self._credentials_info, scopes=SHEETS_SCOPES)
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        credentials.refresh(self._token_request)
+        self._client = gspread.authorize(credentials, session=session)
+        self._credentials = credentials
+
+    def _seconds_to_expiry(self):
+        expiry = self._credentials.expiry  # naive UTC; None for tokens that never expire
+        if expiry is None:
+            return None
+        return (expiry - datetime.now(timezone.utc).replace(tzinfo=None)).total_seconds()
+
+    def _run(self):
+        while True:
+            try:
+                if self._client is None:
+                    self._connect()
+                else:
+                    remaining = self._seconds_to_expiry()
+                    if remaining is not None and remaining < TOKEN_REFRESH_MARGIN:
+                        self._credentials.refresh(self._token_request)
+                self._failures = 0
+                self.last_error = None
+                remaining = self._seconds_to_expiry()
+                delay = 60 if remaining is None else max(5, remaining - TOKEN_REFRESH_MARGIN)
+            except Exception as e:
+                self._failures += 1
+                self.last_error = e
+                first, maximum = RECONNECT_BACKOFF
+                delay = min(maximum, first * 2 ** (self._failures - 1))
+            self._first_attempt.set()
+            time.sleep(min(delay, 60))
+
+    def client(self):
+        """The ready client, or None while (re)connecting"""
+        self._first_attempt.wait(WARMUP_WAIT)
+        return self._client
+
+@process_singleton
+def get_sheets_manager():
+    """Start the process-wide Sheets client manager"""
+    # Build credentials dict from flat structure
+    return SheetsClientManager({key: require_setting(key) for key in CREDENTIAL_KEYS})
+
+def warm_up_sheets():
+    """Begin the Sheets handshake in the background; errors surface in connect_to_sheets"""
+    try:
+        get_sheets_manager()
+    except Exception:
+        pass
+
+def connect_to_sheets():
+    """Return the shared Google Sheets client"""
+    try:
+        manager = get_sheets_manager()
+    except Exception as e:
+        raise OpsError(f"Google Sheets connection error: {e}") from e
+    client = manager.client()
+    if client is None:
+        raise OpsError(f"Google Sheets connection error: {manager.last_error or 'still connecting, try again shortly'}")
+    return client
+
+# ========================================
+# DATA SNAPSHOTS
+# ========================================
+
+def stamp_snapshot(df, source):
+    """Tag a loaded frame with a snapshot id, the same for every read of one shared cache entry"""
+    df.attrs["snapshot"] = f"{source}:{df.attrs.get('stored_at') or time.time_ns()}"
+    return df
+
+def snapshot_id(df):
+    """Return the snapshot id a frame was loaded under (empty if unknown)"""
+    return df.attrs.get("snapshot", "")
+
+def local_timezone():
+    """Zone lead timestamps are bucketed in: the TIMEZONE setting, else the server's zone"""
+    name = get_setting("TIMEZONE") or os.environ.get("TZ")
+    if not name and os.path.islink("/etc/localtime"):
+        name = os.path.realpath("/etc/localtime").split("zoneinfo/")[-1]
+    try:
+        return ZoneInfo(name)
+    except Exception:
+        return datetime.now().astimezone().tzinfo
+
+def local_now():
+    """Current wall-clock time in local_timezone(), naive like parse_timestamps output"""
+    return datetime.now(local_timezone()).replace(tzinfo=None)
+
+# A time followed by Z or a +hh:mm / -hhmm offset
+_UTC_OFFSET_RE = r"\d:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})\s*$"
+
+def parse_timestamps(series):
+    """Parse sheet timestamp strings into naive local_timezone() datetimes (NaT when unparseable).
+
+    Stamps without an offset are taken as local wall time, as written; stamps
+    with one are converted to the local zone, so "today" and the activity
+    windows line up with local_now().
+    """
+    # Rows are written by different tools, so each value is parsed on its own
+    # rather than with one format inferred from the first row
+    has_offset = series.astype(str).str.contains(_UTC_OFFSET_RE, na=False)
+    naive = pd.to_datetime(series.where(~has_offset), errors="coerce", format="mixed")
+    aware = pd.to_datetime(series.where(has_offset), errors="coerce", utc=True, format="mixed")
+    aware = aware.dt.tz_convert(local_timezone()).dt.tz_localize(None)
+    return naive.where(~has_offset, aware).astype("datetime64[ns]")
+
+def invalidate_data():
+    """Drop shared sheet entries so the next load refetches from Sheets"""
+    invalidate_shared("daphne", "opsi")
+
+def iter_json_lines(df, chunk_size=1000):
+    """Yield a frame as JSON lines text, one chunk of rows at a time"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size].to_json(orient="records", lines=True, date_format="iso")
+
+def read_json_lines(lines):
+    """Parse JSON lines input, skipping blank lines; a bare value becomes {"id": value}"""
+    records = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = line  # plain IDs, one per line
+        records.append(record if isinstance(record, dict) else {"id": record})
+    return records
+
+# ========================================
+# LEAD ENRICHMENT
+# ========================================
+# Derived lead columns are computed once per fetched sheet, before the frame
+# is shared, so metrics, filters and group-bys read small categoricals
+# instead of re-scanning organization text on every render.
+
+# Checked in priority order, most specific first: "City Church" is a Church,
+# "City College" a School
+ORG_TYPE_PATTERNS = [
+    ("School", r"schools?|academy|university|college|elementary"),
+    ("Church", r"church\w*|parish|ministr\w*|chapel|cathedral|congregation|fellowship|diocese"),
+    ("City", r"city|town|county|village|municipal\w*|borough|township"),
+    ("Nonprofit", r"foundation|non-?profit|charit\w*|association|society|coalition|alliance"),
+    ("Business", r"inc\.?|co\.|llc|ltd|corp\w*|company|group|enterprises?|partners"),
+]
+ORG_TYPES = [org_type for org_type, _ in ORG_TYPE_PATTERNS] + ["Other"]
+
+# One pass per organization: each alternative is a named group, so a match
+# says which type it hit
+_ORG_TYPE_RE = re.compile(
+    "|".join(rf"\b(?P<t{i}>{pattern})(?!\w)" for i, (_, pattern) in enumerate(ORG_TYPE_PATTERNS)),
+    re.IGNORECASE,
+)
+_EMAIL_DOMAIN_RE = r"@\s*([A-Za-z0-9.-]+)"
+
+def classify_org(name):
+    """Organization type for one organization name ("Other" when nothing matches)"""
+    hits = [int(m.lastgroup[1:]) for m in _ORG_TYPE_RE.finditer(str(name))]
+    return ORG_TYPE_PATTERNS[min(hits)][0] if hits else "Other"
+
+def enrich_leads(df):
+    """Add categorical org_type and email_domain columns to a DAPHNE frame"""
+    org_col = next((c for c in ("organization", "Organization") if c in df.columns), None)
+    email_col = next((c for c in ("Email", "email") if c in df.columns), None)
+
+    if org_col is None:
+        org_type = pd.Series("Other", index=df.index)
+    else:
+        # Organizations repeat across leads, so classify each distinct name once
+        orgs = df[org_col].fillna("").astype(str).astype("category")
+        org_type = orgs.map({org: classify_org(org) for org in orgs.cat.categories})
+    df["org_type"] = pd.Categorical(org_type, categories=ORG_TYPES)
+
+    if email_col is None:
+        domain = pd.Series(None, index=df.index, dtype=object)
+    else:
+        domain = df[email_col].astype(str).str.extract(_EMAIL_DOMAIN_RE, expand=False).str.lower().str.strip(".")
+    df["email_domain"] = domain.astype("category")
+    return df
+
+# ========================================
+# DAPHNE DATA FUNCTIONS (MMM Donor Prospecting)
+# ========================================
+
+DAPHNE_TTL = 300  # seconds a loaded DAPHNE sheet stays fresh
+
+def lead_id_col(columns):
+    return "Donor ID" if "Donor ID" in columns else "Lead ID"
+
+def _fetch_daphne_data():
+    """Download the DAPHNE sheet"""
+    sheet = connect_to_sheets().open_by_key(require_setting("DAPHNE_SHEET_ID")).sheet1
+    df = pd.DataFrame(sheet.get_all_records())
+    record_sheet_deltas("daphne", df, lead_id_col(df.columns))
+    return enrich_leads(df)
+
+def load_daphne_data():
+    """Load DAPHNE donor prospects (shared across workers, fetched from Google Sheets when stale)"""
+    try:
+        return stamp_snapshot(shared_fetch("daphne", DAPHNE_TTL, _fetch_daphne_data), "daphne")
+    except OpsError:
+        raise
+    except Exception as e:
+        raise OpsError(f"Error loading DAPHNE data: {e}") from e
+
+# ========================================
+# APPROVAL LEDGER
+# ========================================
+
+class ApprovalLedger:
+    """Append-only JSONL record of Donor IDs already sent to DIANA.
+
+    The file is read once into a set; later calls only read lines appended
+    since the last known offset, so appends from other processes are picked up
+    without rescanning the whole history. IDs are compared as strings: sheet
+    cells load numeric IDs as ints while the CLI and API pass text. IDs are
+    claimed before the webhook call; a failed call appends "released" lines
+    that take them back out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._approved = set()
+        self._offset = 0
+
+    def _catch_up(self):
+        records, self._offset = read_jsonl_since(self.path, self._offset)
+        for record in records:
+            if "donor_id" not in record:
+                continue
+            if record.get("released"):
+                self._approved.discard(str(record["donor_id"]))
+            else:
+                self._approved.add(str(record["donor_id"]))
+
+    def __len__(self):
+        with self._lock:
+            self._catch_up()
+            return len(self._approved)
+
+    def __contains__(self, donor_id):
+        with self._lock:
+            self._catch_up()
+            return str(donor_id) in self._approved
+
+    def approved_among(self, donor_ids):
+        """Return the subset of the given Donor IDs that were already approved"""
+        with self._lock:
+            self._catch_up()
+            return {donor_id for donor_id in donor_ids if str(donor_id) in self._approved}
+
+    def _split(self, donor_ids):
+        self._catch_up()
+        new, seen = [], []
+        unique = {}
+        for donor_id in donor_ids:
+            unique.setdefault(str(donor_id), donor_id)  # first spelling of each ID wins
+        for key, donor_id in unique.items():
+            (seen if key in self._approved else new).append(donor_id)
+        return new, seen
+
+    def split(self, donor_ids):
+        """Split Donor IDs into (not yet approved, already approved) lists"""
+        with self._lock:
+            return self._split(donor_ids)
+
+    def claim(self, donor_ids, approved_by, timestamp):
+        """Record the not yet approved Donor IDs and return (claimed, already approved) lists"""
+        with self._lock:
+            new, seen = self._split(donor_ids)
+            append_jsonl(self.path, [
+                {"donor_id": str(donor_id), "approved_by": approved_by, "approved_at": timestamp}
+                for donor_id in new
+            ])
+            self._catch_up()
+            return new, seen
+
+    def release(self, donor_ids):
+        """Take claimed Donor IDs back out of the ledger after a failed send"""
+        with self._lock:
+            append_jsonl(self.path, [{"donor_id": str(donor_id), "released": True} for donor_id in donor_ids])
+            self._catch_up()
+
+@process_singleton
+def get_approval_ledger():
+    """Get the process-wide approval ledger"""
+    return ApprovalLedger(get_setting("APPROVAL_LEDGER_PATH", "data/approval_ledger.jsonl"))
+
+def send_approved_leads_to_diana(donor_ids, approved_by="Dashboard User"):
+    """Send approved Donor IDs to DIANA webhook, skipping ones already approved"""
+    # The IDs are claimed in the ledger before the call, so a ledger failure
+    # stops the send instead of leaving sent IDs unrecorded for a resend
+    ledger = get_approval_ledger()
+    timestamp = datetime.now().isoformat()
+    try:
+        donor_ids, _ = ledger.claim(donor_ids, approved_by, timestamp)
+    except OSError as e:
+        return False, f"Could not record approvals, nothing was sent: {e}"
+    if not donor_ids:
+        return False, "All selected prospects were already approved"
+
+    # Use MMM-specific webhook
+    webhook_url = get_setting(
+        "DIANA_APPROVAL_WEBHOOK",
+        "https://infomoneymindsetmakeover.app.n8n.cloud/webhook/daphne-approve-leads"
+    )
+
+    payload = {
+        "approved_donors": donor_ids,
+        "approved_by": approved_by,
+        "timestamp": timestamp
+    }
+
+    try:
+        response = requests.post(webhook_url, json=payload, timeout=10)
+    except Exception as e:
+        response = str(e)
+    if getattr(response, "status_code", None) != 200:
+        try:
+            ledger.release(donor_ids)
+        except OSError as e:
+            response = f"{response} (the IDs are still marked approved in the ledger: {e})"
+        return False, response
+    record_event("leads_approved", approved_by, donor_ids)
+    return True, response
+
+# ========================================
+# OPSI DATA FUNCTIONS
+# ========================================
+
+OPSI_TTL = 60  # seconds a loaded OPSI sheet stays fresh
+
+def _fetch_opsi_data():
+    """Download the OPSI sheet"""
+    sheet = connect_to_sheets().open_by_key(require_setting("OPSI_SHEET_ID")).sheet1
+    df = pd.DataFrame(sheet.get_all_records())
+    record_sheet_deltas("opsi", df, _opsi_task_id_col(df.columns))
+    return df
+
+def load_opsi_data():
+    """Load OPSI tasks (shared across workers, fetched from Google Sheets when stale)"""
+    try:
+        return stamp_snapshot(shared_fetch("opsi", OPSI_TTL, _fetch_opsi_data), "opsi")
+    except OpsError:
+        raise
+    except Exception as e:
+        raise OpsError(f"Error loading OPSI data: {e}") from e
+
+def send_opsi_task(task_data, actor="Dashboard User"):
+    """Send new OPSI task to n8n webhook"""
+    # Use MMM-specific webhook
+    webhook_url = get_setting(
+        "OPSI_CREATE_WEBHOOK",
+        "https://infomoneymindsetmakeover.app.n8n.cloud/webhook/opsi-create-task"
+    )
+
+    try:
+        response = requests.post(webhook_url, json=task_data, timeout=10)
+    except Exception as e:
+        raise OpsError(f"Error sending OPSI task: {e}") from e
+    if response.status_code != 200:
+        raise OpsError(f"OPSI webhook error: {response.status_code}")
+    result = response.json()
+    task_id = result.get("taskId") if isinstance(result, dict) else None
+    record_event("task_created", actor, [task_id or task_data.get("title", "")], task_data)
+    invalidate_shared("opsi")  # every caller (dashboard, CLI, API) sees the new task on its next load
+    return result
+
+def update_opsi_task(update_data, actor="Dashboard User", load=load_opsi_data):
+    """Update existing OPSI task via n8n webhook, or directly in Sheets in "direct" write mode"""
+    if get_opsi_write_mode() == "direct":
+        return update_opsi_tasks_direct([update_data], actor, load)
+
+    # Use MMM-specific webhook
+    webhook_url = get_setting(
+        "OPSI_UPDATE_WEBHOOK",
+        "https://infomoneymindsetmakeover.app.n8n.cloud/webhook/opsi-update-task"
+    )
+
+    try:
+        response = requests.post(webhook_url, json=update_data, timeout=10)
+    except Exception as e:
+        raise OpsError(f"Error updating OPSI task: {e}") from e
+    if response.status_code != 200:
+        raise OpsError(f"OPSI update webhook error: {response.status_code}")
+    record_event("task_updated", actor, [update_data.get("taskId", "")], update_data)
+    invalidate_shared("opsi")
+    return response.json()
+
+def update_opsi_tasks(updates, actor="Dashboard User", load=load_opsi_data):
+    """Apply several OPSI task updates; one batched Sheets write in "direct" mode"""
+    if get_opsi_write_mode() == "direct":
+        return update_opsi_tasks_direct(updates, actor, load)
+    return [update_opsi_task(update_data, actor, load) for update_data in updates]
+
+# ========================================
+# OPSI DIRECT SHEETS WRITES
+# ========================================
+
+# Webhook payload field -> candidate sheet headers (some headers carry a trailing space)
+OPSI_UPDATE_FIELDS = {
+    "taskType": ["Task Type", "TaskType"],
+    "title": ["Task Title", "Title"],
+    "assignedTo": ["Assigned To", "AssignedTo"],
+    "deadline": ["Deadline Date"],
+    "status": ["Status ", "Status"],
+    "priority": ["Priority ", "Priority"],
+    "notes": ["Notes"],
+}
+OPSI_PARSED_FIELDS = {"deadline"}  # written as if typed, so Sheets stores a date
+
+def get_opsi_write_mode():
+    """Return "webhook" (default, via n8n) or "direct" (batched Sheets writes)"""
+    return get_setting("OPSI_WRITE_MODE", "webhook")
+
+def _opsi_task_id_col(columns):
+    return "Task ID" if "Task ID" in columns else "OPSI ID"
+
+_row_indexes = {}  # snapshot id -> {Task ID: sheet row}, newest two snapshots
+
+def _opsi_row_index(df):
+    """Map Task ID -> sheet row number for one OPSI snapshot"""
+    snapshot = snapshot_id(df)
+    if snapshot not in _row_indexes:
+        task_id_col = _opsi_task_id_col(df.columns)
+        # Row 1 is the header, so frame position p lives on sheet row p + 2
+        index = {str(task_id): pos + 2 for pos, task_id in enumerate(df[task_id_col])} if task_id_col in df.columns else {}
+        while len(_row_indexes) >= 2:
+            _row_indexes.pop(next(iter(_row_indexes)))
+        _row_indexes[snapshot] = index
+    return _row_indexes[snapshot]
+
+def _locate_opsi_rows(sheet, task_ids, row_index, id_col_num):
+    """Resolve Task IDs to sheet rows, re-indexing if the cached rows have shifted"""
+    rows = [row_index.get(task_id) for task_id in task_ids]
+    if None not in rows:
+        # Confirm the cached rows still hold these IDs (rows may have moved since the snapshot)
+        cells = sheet.batch_get([rowcol_to_a1(row, id_col_num) for row in rows])
+        found = [str(cell[0][0]) if cell and cell[0] else "" for cell in cells]
+        if found == task_ids:
+            return rows
+
+    # Stale or incomplete index: rebuild it from the live Task ID column
+    live_ids = sheet.col_values(id_col_num)
+    live_index = {str(task_id): row for row, task_id in enumerate(live_ids, start=1) if row > 1}
+    return [live_index.get(task_id) for task_id in task_ids]
+
+def update_opsi_tasks_direct(updates, actor="Dashboard User", load=load_opsi_data):
+    """Write OPSI task updates straight to the sheet in one batched range update.
+
+    `load` supplies the current OPSI frame; the row index is built once per
+    snapshot and reused across updates.
+    """
+    client = connect_to_sheets()
+    df = load()
+    headers = list(df.columns)
+    task_id_col = _opsi_task_id_col(headers)
+    if task_id_col not in headers:
+        raise OpsError("Task ID column not found in OPSI sheet")
+
+    try:
+        sheet = client.open_by_key(require_setting("OPSI_SHEET_ID")).sheet1
+        task_ids = [str(update["taskId"]) for update in updates]
+        rows = _locate_opsi_rows(sheet, task_ids, _opsi_row_index(df), headers.index(task_id_col) + 1)
+    except Exception as e:
+        raise OpsError(f"Error writing OPSI tasks to Sheets: {e}") from e
+
+    missing = [task_id for task_id, row in zip(task_ids, rows) if row is None]
+    if missing:
+        raise OpsError(f"Task ID(s) not found in OPSI sheet: {', '.join(missing)}")
+
+    # One USER_ENTERED batch keeps the write a single request; a leading
+    # apostrophe makes Sheets store the free-text fields literally instead of
+    # evaluating "=..." as a formula or coercing numbers and dates
+    data = []
+    for update, row in zip(updates, rows):
+        for field, names in OPSI_UPDATE_FIELDS.items():
+            header = next((name for name in names if name in headers), None)
+            if field in update and header is not None:
+                value = update[field]
+                if field not in OPSI_PARSED_FIELDS and isinstance(value, str) and value:
+                    value = "'" + value
+                data.append({
+                    "range": rowcol_to_a1(row, headers.index(header) + 1),
+                    "values": [[value]]
+                })
+
+    try:
+        sheet.batch_update(data, value_input_option="USER_ENTERED")
+    except Exception as e:
+        raise OpsError(f"Error writing OPSI tasks to Sheets: {e}") from e
+    for update in updates:
+        record_event("task_updated", actor, [update["taskId"]], update)
+    invalidate_shared("opsi")
+    return {"success": True, "updated": task_ids}
+
+# ========================================
+# FILTERS
+# ========================================
+
+LEAD_SEARCH_COLUMNS = ["Name", "Email", "Organization", "name", "email", "organization"]
+
+def opsi_columns(df):
+    """Resolve OPSI header variants (trailing spaces, old names) to the columns in this sheet"""
+    def pick(*names):
+        return next((name for name in names if name in df.columns), names[0])
+    return {
+        "task_id": pick("Task ID", "OPSI ID"),
+        "title": pick("Task Title", "Title"),
+        "status": pick("Status ", "Status"),
+        "priority": pick("Priority ", "Priority"),
+        "assigned": pick("Assigned To", "AssignedTo"),
+        "task_type": pick("Task Type", "TaskType"),
+    }
+
+def search_frame(df, text, columns):
+    """Rows where any of `columns` contains `text`, ignoring case"""
+    if not text:
+        return df
+    mask = pd.Series(False, index=df.index)
+    for col in columns:
+        if col in df.columns:
+            mask |= df[col].astype(str).str.contains(text, case=False, regex=False, na=False)
+    return df[mask]
+
+def search_leads(df, text):
+    """Leads whose name, email or organization contains `text`"""
+    return search_frame(df, text, LEAD_SEARCH_COLUMNS)
+
+def search_tasks(df, text):
+    """Tasks whose title, assignee or type contains `text`"""
+    cols = opsi_columns(df)
+    return search_frame(df, text, [cols["title"], cols["assigned"], cols["task_type"]])
+
+def filter_rows(df, **equals):
+    """Rows whose columns equal the given values (None values are ignored)"""
+    for col, value in equals.items():
+        if value is not None and col in df.columns:
+            column = df[col]
+            if not isinstance(column.dtype, pd.CategoricalDtype):
+                column = column.astype(str)  # sheet cells mix numbers and text
+            df = df[column == str(value)]
+    return df
+
+# ========================================
+# DEADLINE INDEX
+# ========================================
+
+CLOSED_STATUSES = {"Completed", "Cancelled"}
+
+class DeadlineIndex:
+    """Open OPSI tasks ordered by parsed Deadline Date.
+
+    Built once per OPSI snapshot; every create/update clears the data cache,
+    so the next snapshot rebuilds it. Queries bisect the sorted keys instead of
+    filtering the whole frame.
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self._keys = []  # sorted (deadline ordinal, row position) pairs
+
+        if df.empty or "Deadline Date" not in df.columns:
+            return
+
+        status_col = "Status " if "Status " in df.columns else "Status"
+        deadlines = parse_deadlines(df["Deadline Date"])
+        is_open = ~df[status_col].isin(CLOSED_STATUSES) if status_col in df.columns else pd.Series(True, index=df.index)
+        mask = (deadlines.notna() & is_open).to_numpy()
+
+        ordinals = [d.toordinal() for d in deadlines[mask]]
+        positions = [pos for pos, ok in enumerate(mask) if ok]
+        self._keys = sorted(zip(ordinals, positions))
+
+    def _rows(self, keys):
+        return self._df.iloc[[pos for _, pos in keys]]
+
+    def _bound(self, day):
+        return bisect.bisect_left(self._keys, (day.toordinal(), -1))
+
+    def overdue(self, today=None):
+        """Open tasks whose deadline is before today, oldest first"""
+        return self._rows(self._keys[:self._bound(today or date.today())])
+
+    def overdue_count(self, today=None):
+        return self._bound(today or date.today())
+
+    def due_within(self, days, today=None):
+        """Open tasks due from today through today + days, soonest first"""
+        today = today or date.today()
+        return self._rows(self._keys[self._bound(today):self._bound(today + timedelta(days=days + 1))])
+
+    def due_within_count(self, days, today=None):
+        today = today or date.today()
+        return self._bound(today + timedelta(days=days + 1)) - self._bound(today)
+
+    def next_deadlines(self, k, today=None):
+        """The k soonest upcoming open deadlines from today"""
+        lo = self._bound(today or date.today())
+        return self._rows(self._keys[lo:lo + k])
+
+def parse_deadlines(series):
+    """Parse "Deadline Date" cells (NaT when blank or unparseable)"""
+    return pd.to_datetime(series, errors="coerce", format="mixed")
+
+def sort_by_deadline(df):
+    """Rows in deadline order; rows without a usable deadline keep sheet order at the end"""
+    if df.empty or "Deadline Date" not in df.columns:
+        return df
+    order = parse_deadlines(df["Deadline Date"]).sort_values(kind="stable", na_position="last").index
+    return df.loc[order]
+
+# ========================================
+# METRICS
+# ========================================
+
+def lead_metrics(df):
+    """Headline DAPHNE lead counts"""
+    status = df["Status"] if "Status" in df.columns else pd.Series(dtype=str)
+    org_types = df["org_type"].value_counts() if "org_type" in df.columns else pd.Series(dtype=int)
+    return {
+        "total_leads": len(df),
+        "qualified": int((status == "Qualified").sum()),
+        "contacted": int((status == "Contacted").sum()),
+        "cities": int(org_types.get("City", 0)),
+        "churches": int(org_types.get("Church", 0)),
+        "schools": int(org_types.get("School", 0)),
+        "nonprofits": int(org_types.get("Nonprofit", 0)),
+        "businesses": int(org_types.get("Business", 0)),
+    }
+
+def task_metrics(df, deadline_index=None, due_days=7):
+    """Headline OPSI task counts"""
+    cols = opsi_columns(df)
+    status = df[cols["status"]] if cols["status"] in df.columns else pd.Series(dtype=str)
+    priority = df[cols["priority"]] if cols["priority"] in df.columns else pd.Series(dtype=str)
+    deadline_index = deadline_index or DeadlineIndex(df)
+    return {
+        "total_tasks": len(df),
+        "pending": int((status == "New").sum()),
+        "in_progress": int((status == "In Progress").sum()),
+        "high_priority": int((priority == "High").sum()),
+        "overdue": deadline_index.overdue_count(),
+        f"due_within_{due_days}_days": deadline_index.due_within_count(due_days),
+    }
+
+# ========================================
+# QUERIES
+# ========================================
+
+def query_leads(search=None, status=None, limit=None, org_type=None, email_domain=None):
+    """DAPHNE leads matching a search text, Status, organization type and/or email domain"""
+    df = filter_rows(load_daphne_data(), Status=status, org_type=org_type, email_domain=email_domain)
+    df = search_leads(df, search)
+    return df.head(limit) if limit else df
+
+def query_tasks(search=None, status=None, assigned=None, overdue=False, due_within=None, limit=None):
+    """OPSI tasks by search text, status and assignee; overdue/due_within switch to deadline order"""
+    df = load_opsi_data()
+    if overdue:
+        df = DeadlineIndex(df).overdue()
+    elif due_within is not None:
+        df = DeadlineIndex(df).due_within(due_within)
+    cols = opsi_columns(df)
+    df = filter_rows(search_tasks(df, search), **{cols["status"]: status, cols["assigned"]: assigned})
+    return df.head(limit) if limit else df
+
+def summary_metrics():
+    """Lead, task and approval counts in one record"""
+    return {
+        **lead_metrics(load_daphne_data()),
+        **task_metrics(load_opsi_data()),
+        "approved": len(get_approval_ledger()),
+    }
+
+# ========================================
+# BATCH OPERATIONS
+# ========================================
+
+def approve_leads(donor_ids, approved_by="Ops API"):
+    """Approve a batch of Donor IDs in one DIANA webhook call"""
+    donor_ids = [str(donor_id) for donor_id in donor_ids]
+    new, seen = get_approval_ledger().split(donor_ids)
+    if not new:
+        return {"success": False, "approved": [], "skipped": seen, "message": "All prospects were already approved"}
+    success, response = send_approved_leads_to_diana(new, approved_by)
+    result = {"success": success, "approved": new if success else [], "skipped": seen}
+    if not success:
+        result["message"] = response if isinstance(response, str) else f"DIANA webhook error: {response.status_code}"
+    return result
+
+def create_tasks(tasks, actor="Ops API"):
+    """Create OPSI tasks one webhook call at a time, yielding a result per task"""
+    for task_data in tasks:
+        try:
+            yield {"success": True, "task": task_data.get("title", ""), "result": send_opsi_task(task_data, actor)}
+        except OpsError as e:
+            yield {"success": False, "task": task_data.get("title", ""), "error": str(e)}
+
+def update_tasks(updates, actor="Ops API"):
+    """Apply OPSI task updates, yielding a result per task.
+
+    "direct" write mode sends the whole batch as one Sheets write; webhook mode
+    posts each update and reports failures individually.
+    """
+    if get_opsi_write_mode() == "direct":
+        try:
+            update_opsi_tasks_direct(updates, actor)
+            for update in updates:
+                yield {"success": True, "taskId": update.get("taskId")}
+        except OpsError as e:
+            for update in updates:
+                yield {"success": False, "taskId": update.get("taskId"), "error": str(e)}
+        return
+    for update in updates:
+        try:
+            update_opsi_task(update, actor)
+            yield {"success": True, "taskId": update.get("taskId")}
+        except OpsError as e:
+            yield {"success": False, "taskId": update.get("taskId"), "error": str(e)}
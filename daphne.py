@@ -1,6 +1,13 @@
 import streamlit as st
 import pandas as pd
-from utils import load_daphne_data
+import numpy as np
+import bisect
+import threading
+from agents import Agent, DataSource, register, LOCAL_CACHE_TTL
+from core import lead_metrics, lead_id_col, local_now
+from utils import load_daphne_data, snapshot_id, parse_timestamps
+
+LEADS = DataSource("daphne.leads", load_daphne_data, ttl=LOCAL_CACHE_TTL)
 
 def get_daphne_status():
     """Return DAPHNE agent status"""
@@ -9,7 +16,189 @@ def get_daphne_status():
 def get_daphne_leads():
     """Get DAPHNE donor prospects as list of dictionaries"""
     try:
-        df = load_daphne_data()
+        df = LEADS.load()
         return df.to_dict('records') if not df.empty else []
     except:
         return []
+
+# ========================================
+# LEAD TIMESTAMP INDEX
+# ========================================
+
+def _timestamp_col(df):
+    """Find the lead timestamp column (sheet headers vary in case)"""
+    for col in ("timestamp", "Timestamp"):
+        if col in df.columns:
+            return col
+    return None
+
+class LeadTimeIndex:
+    """Timestamp-ordered index over DAPHNE lead rows.
+
+    The sheet is append-only in practice, so each new snapshot only parses and
+    inserts the rows past the last indexed position. Every row's ID and raw
+    timestamp are hashed (one vectorized pass, much cheaper than parsing); if
+    the hashes of the already-indexed rows changed - rows deleted, reordered
+    or edited - or the columns did, the index is rebuilt.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # sorted (timestamp ns, row position) pairs
+        self._indexed = 0
+        self._columns = None
+        self._row_hashes = np.empty(0, dtype="uint64")  # (ID, timestamp) hash per indexed row
+        self._snapshot = None
+        self._df = pd.DataFrame()
+
+    def sync(self, df):
+        """Bring the index up to date with a loaded DAPHNE frame"""
+        snapshot = snapshot_id(df)
+        with self._lock:
+            if snapshot and snapshot == self._snapshot:
+                return
+            ts_col = _timestamp_col(df)
+            row_hashes = self._hash_rows(df, ts_col)
+            if (len(df) < self._indexed or list(df.columns) != self._columns
+                    or not np.array_equal(row_hashes[:self._indexed], self._row_hashes)):
+                self._keys = []
+                self._indexed = 0
+
+            if ts_col is not None and len(df) > self._indexed:
+                parsed = parse_timestamps(df[ts_col].iloc[self._indexed:])
+                valid = parsed.notna().to_numpy()
+                stamps = parsed[valid].to_numpy().astype("int64")
+                positions = range(self._indexed, len(df))
+                new_keys = sorted(zip(stamps.tolist(), [p for p, ok in zip(positions, valid) if ok]))
+
+                if not self._keys or not new_keys or new_keys[0] >= self._keys[-1]:
+                    # Common case: rows arrive in time order, so this is an append
+                    self._keys.extend(new_keys)
+                else:
+                    for key in new_keys:
+                        bisect.insort(self._keys, key)
+
+            self._indexed = len(df)
+            self._columns = list(df.columns)
+            self._row_hashes = row_hashes
+            self._snapshot = snapshot
+            self._df = df
+
+    @staticmethod
+    def _hash_rows(df, ts_col):
+        cols = [col for col in (lead_id_col(df.columns), ts_col) if col in df.columns]
+        if not cols:
+            return np.zeros(len(df), dtype="uint64")
+        return pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy()
+
+    def newest(self, k):
+        """Return the k most recent leads, newest first"""
+        with self._lock:
+            positions = [pos for _, pos in reversed(self._keys[-k:])] if k > 0 else []
+            return self._df.iloc[positions]
+
+    def between(self, start, end):
+        """Return leads with start <= timestamp <= end, newest first"""
+        lo_key = (pd.Timestamp(start).value, -1)
+        hi_key = (pd.Timestamp(end).value, float("inf"))
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, lo_key)
+            hi = bisect.bisect_right(self._keys, hi_key)
+            positions = [pos for _, pos in reversed(self._keys[lo:hi])]
+            return self._df.iloc[positions]
+
+@st.cache_resource
+def _lead_time_index():
+    """Process-wide lead timestamp index, shared across sessions"""
+    return LeadTimeIndex()
+
+def _synced_lead_index():
+    index = _lead_time_index()
+    index.sync(LEADS.load())
+    return index
+
+def get_recent_leads(k=5):
+    """Get the k newest DAPHNE leads by timestamp"""
+    try:
+        recent = _synced_lead_index().newest(k)
+        if recent.empty:
+            # No parseable timestamps: sheet order is arrival order
+            return LEADS.load().tail(k).iloc[::-1]
+        return recent
+    except:
+        return pd.DataFrame()
+
+def get_leads_between(start, end):
+    """Get DAPHNE leads whose timestamp falls in [start, end], newest first"""
+    try:
+        return _synced_lead_index().between(start, end)
+    except:
+        return pd.DataFrame()
+
+# ========================================
+# LEAD ROLLUPS (DAILY / WEEKLY)
+# ========================================
+
+@st.cache_data(max_entries=2)
+def _build_lead_rollups(snapshot, _df):
+    """Bucket leads into daily and weekly count tables by status and org type"""
+    df = _df
+    ts_col = _timestamp_col(df)
+    if ts_col is None or df.empty:
+        return {}
+
+    day = parse_timestamps(df[ts_col]).dt.normalize()
+    status = df["Status"].astype(str) if "Status" in df.columns else pd.Series("Unknown", index=df.index)
+    keys = pd.DataFrame({"day": day, "Status": status, "Org Type": df["org_type"].astype(str)}).dropna(subset=["day"])
+    if keys.empty:
+        return {}
+
+    days = pd.date_range(keys["day"].min(), keys["day"].max(), freq="D")
+    rollups = {}
+    for group in ("Status", "Org Type"):
+        daily = keys.groupby(["day", group]).size().unstack(fill_value=0).reindex(days, fill_value=0)
+        daily["Total"] = daily.sum(axis=1)
+        daily.index.name = "Date"
+        rollups[("daily", group)] = daily
+        rollups[("weekly", group)] = daily.resample("W-MON", label="left", closed="left").sum()
+    return rollups
+
+def get_lead_rollups():
+    """Get daily/weekly lead count rollups for the current DAPHNE snapshot.
+
+    Keys are (granularity, group) tuples, e.g. ("daily", "Status") or
+    ("weekly", "Org Type"); each value is a date-indexed count table with a
+    "Total" column.
+    """
+    try:
+        df = LEADS.load()
+        return _build_lead_rollups(snapshot_id(df), df)
+    except:
+        return {}
+
+def get_lead_count_on(date=None):
+    """Get the number of leads added on a given calendar date (default: today in the local zone)"""
+    date = local_now() if date is None else date
+    daily = get_lead_rollups().get(("daily", "Status"))
+    if daily is None:
+        return 0
+    return int(daily["Total"].get(pd.Timestamp(date).normalize(), 0))
+
+# ========================================
+# REGISTRY
+# ========================================
+
+def daphne_metrics(data):
+    """Headline lead counts for the overview"""
+    counts = lead_metrics(data["daphne.leads"])
+    return {"Total Leads": counts["total_leads"], "Qualified Leads": counts["qualified"], "Contacted": counts["contacted"]}
+
+register(Agent(
+    key="daphne",
+    name="DAPHNE",
+    icon="🎯",
+    description="Community Outreach & Research Assistant",
+    status=get_daphne_status,
+    sources=[LEADS],
+    metrics=daphne_metrics,
+))
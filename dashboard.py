@@ -1,10 +1,15 @@
 import streamlit as st
-from datetime import datetime
-import pandas as pd
-from daphne import get_daphne_status, get_daphne_leads
-from diana import get_diana_status
-from opsi import get_opsi_status, load_opsi_tasks
-from utils import load_daphne_data, send_approved_leads_to_diana, load_opsi_data, send_opsi_task, update_opsi_task
+from datetime import datetime, timedelta
+from functools import partial
+from daphne import get_recent_leads, get_leads_between, get_lead_rollups, get_lead_count_on
+from diana import with_outreach_status, get_outreach_funnel
+from opsi import get_deadline_index, get_task_id_index, MAX_TASK_CANDIDATES
+from agents import load_agents, load_sources, metric_sources
+from activity import get_activity_log, events_frame
+from tables import windowed_table
+from core import search_leads, search_tasks, lead_metrics, task_metrics, sort_by_deadline, local_now, ORG_TYPES
+from profiling import start_page_profile, finish_page_profile
+from utils import send_approved_leads_to_diana, get_approval_ledger, send_opsi_task, update_opsi_task, clear_data_caches, warm_up_sheets
 
 # ========================================
 # PAGE CONFIGURATION
@@ -16,6 +21,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Connect to Sheets in the background while the rest of the page builds
+warm_up_sheets()
+
+# Profile this rerun when ?profile=1 or the PROFILE_PAGES secret is set
+start_page_profile()
+
 # ========================================
 # CUSTOM STYLING
 # ========================================
@@ -96,9 +107,8 @@ with st.sidebar:
     st.markdown("### 📊 System Status")
     
     # Get agent statuses dynamically
-    daphne_status = get_daphne_status()
-    diana_status = get_diana_status()
-    opsi_status = get_opsi_status()
+    agents = load_agents()
+    agent_statuses = {agent.key: agent.status() for agent in agents}
     
     # Map status to CSS class
     status_class_map = {
@@ -107,9 +117,9 @@ with st.sidebar:
         "Offline": "status-offline"
     }
     
-    st.markdown(f'<span class="{status_class_map.get(daphne_status, "status-offline")}">● DAPHNE: {daphne_status}</span>', unsafe_allow_html=True)
-    st.markdown(f'<span class="{status_class_map.get(diana_status, "status-offline")}">● DIANA: {diana_status}</span>', unsafe_allow_html=True)
-    st.markdown(f'<span class="{status_class_map.get(opsi_status, "status-offline")}">● OPSI: {opsi_status}</span>', unsafe_allow_html=True)
+    for agent in agents:
+        status = agent_statuses[agent.key]
+        st.markdown(f'<span class="{status_class_map.get(status, "status-offline")}">● {agent.name}: {status}</span>', unsafe_allow_html=True)
     
     st.markdown("---")
     st.caption(f"v2.0 • Last updated: {datetime.now().strftime('%H:%M:%S')}")
@@ -124,525 +134,293 @@ st.markdown("**Your AI-Powered Business Operations Platform**")
 st.markdown("---")
 
 # ========================================
-# PAGE ROUTING
+# FRAGMENTS
 # ========================================
+# Interactive regions rerun on their own (st.fragment), so a checkbox tick
+# or keystroke does not re-execute the whole page.
 
-if st.session_state.selected_page == "Dashboard Overview":
-    # ========================================
-    # DASHBOARD OVERVIEW PAGE
-    # ========================================
+@st.fragment
+def activity_feed():
+    """Recent approvals, task edits and sheet changes, read from the local event log"""
+    st.markdown("### 📰 Activity Feed")
+    activity_log = get_activity_log()
     
-    # Agent Status Cards
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3 = st.columns([2, 2, 1])
     
     with col1:
-        status_badge = f'<span class="{status_class_map.get(daphne_status, "status-offline")}">{daphne_status.upper()}</span>'
-        st.markdown(f"""
-        <div class="agent-card">
-            <h3>🎯 DAPHNE</h3>
-            <p>Community Outreach & Research Assistant</p>
-            <div style="margin-top: 1rem;">
-                {status_badge}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        event_kind = st.selectbox(
+            "Event type:",
+            ["All events"] + activity_log.kinds(),
+            format_func=lambda kind: kind.replace("_", " ").title(),
+            key="activity_kind"
+        )
     
     with col2:
-        status_badge = f'<span class="{status_class_map.get(diana_status, "status-offline")}">{diana_status.upper()}</span>'
-        st.markdown(f"""
-        <div class="agent-card">
-            <h3>📧 DIANA</h3>
-            <p>Marketing & Research Knowledge</p>
-            <div style="margin-top: 1rem;">
-                {status_badge}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        event_user = st.selectbox("User:", ["All users"] + activity_log.users(), key="activity_user")
     
     with col3:
-        status_badge = f'<span class="{status_class_map.get(opsi_status, "status-offline")}">{opsi_status.upper()}</span>'
-        st.markdown(f"""
-        <div class="agent-card">
-            <h3>📋 OPSI</h3>
-            <p>Operations & Policy System</p>
-            <div style="margin-top: 1rem;">
-                {status_badge}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        event_limit = st.selectbox("Show:", [25, 100, 500], key="activity_limit")
     
-    st.markdown("---")
+    events = activity_log.query(
+        kind=None if event_kind == "All events" else event_kind,
+        user=None if event_user == "All users" else event_user,
+        limit=event_limit
+    )
     
-    # Quick Metrics
-    col1, col2, col3, col4 = st.columns(4)
+    if events:
+        st.dataframe(events_frame(events), width="stretch", hide_index=True)
+    else:
+        st.info("No activity recorded yet.")
+
+def _toggle_prospect(key, donor_id):
+    """Row checkbox on_change: add or drop one prospect from the selection"""
+    if st.session_state[key]:
+        st.session_state.selected_prospects.add(donor_id)
+    else:
+        st.session_state.selected_prospects.discard(donor_id)
+
+def _apply_select_all(row_keys):
+    """Select All on_change: tick or untick every visible prospect that can still be approved"""
+    checked = st.session_state.select_all_checkbox
+    for key, donor_id in row_keys:
+        st.session_state[key] = checked
+        if checked:
+            st.session_state.selected_prospects.add(donor_id)
+        else:
+            st.session_state.selected_prospects.discard(donor_id)
+
+@st.fragment
+def prospect_selection_grid(df):
+    """Search, select and approve prospects; reruns on its own when a box is ticked"""
+    st.markdown("### Select Prospects to Approve")
+    
+    # Search filter FIRST
+    search_approve = st.text_input("🔍 Search prospects...", key="search_approve_filter")
     
-    # Get data from agents
-    daphne_leads = get_daphne_leads()
-    opsi_tasks = load_opsi_tasks()
+    # Filter dataframe based on search
+    filtered_df = search_leads(df, search_approve)
+    
+    st.markdown(f"**Showing {len(filtered_df)} of {len(df)} prospects**")
+    
+    # Button row (without Select All)
+    col1, col2, col3 = st.columns([2, 2, 2])
     
     with col1:
-        st.metric("Total Leads", len(daphne_leads))
+        if st.button("🔄 Refresh Data", width="stretch", key="refresh_top"):
+            clear_data_caches()
+            if 'selected_prospects' in st.session_state:
+                st.session_state.selected_prospects = set()
+            st.rerun()
     
     with col2:
-        qualified = sum(1 for lead in daphne_leads if lead.get('Status') == 'Qualified')
-        st.metric("Qualified Leads", qualified)
+        approve_btn_top = st.button(
+            "✅ Approve Selected Prospects",
+            type="primary",
+            width="stretch",
+            key="approve_top"
+        )
     
     with col3:
-        contacted = sum(1 for lead in daphne_leads if lead.get('Status') == 'Contacted')
-        st.metric("Contacted", contacted)
-    
-    with col4:
-        pending_tasks = len([t for t in opsi_tasks.to_dict('records') if t.get('Status') == 'New' or t.get('Status ') == 'New']) if not opsi_tasks.empty else 0
-        st.metric("Pending Tasks", pending_tasks)
+        # CSV Download button
+        if len(filtered_df) > 0:
+            # CSV is built only when the button is clicked, not on every tick
+            st.download_button(
+                "📥 Download CSV",
+                partial(filtered_df.to_csv, index=False),
+                f"prospects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                "text/csv",
+                width="stretch"
+            )
     
     st.markdown("---")
     
-    # Recent Activity - Two Columns
-    col1, col2 = st.columns([1, 1])
+    # Initialize session state for selections
+    if 'selected_prospects' not in st.session_state:
+        st.session_state.selected_prospects = set()
     
-    with col1:
-        st.markdown("### 📊 Recent Leads")
-        if daphne_leads:
-            recent_df = pd.DataFrame(daphne_leads).head(5)
-            st.dataframe(recent_df, width="stretch", hide_index=True)
-            
-            # Add Approve Leads button
-            if st.button("Approve Leads", width="stretch", type="primary"):
-                st.session_state.selected_page = "Approve Leads"
-                st.rerun()
-        else:
-            st.info("No recent leads. Run DAPHNE to generate leads.")
-    
-    with col2:
-        st.markdown("### 🔥 High Priority Pending Tasks")
-        if not opsi_tasks.empty:
-            # Determine column names (handle trailing spaces)
-            status_col = "Status " if "Status " in opsi_tasks.columns else "Status"
-            priority_col = "Priority " if "Priority " in opsi_tasks.columns else "Priority"
-            task_id_col = "Task ID" if "Task ID" in opsi_tasks.columns else "OPSI ID"
-            task_title_col = "Task Title" if "Task Title" in opsi_tasks.columns else "Title"
-            
-            # Filter for High Priority + New/Pending status
-            high_priority_pending = opsi_tasks[
-                (opsi_tasks[priority_col] == "High") & 
-                (opsi_tasks[status_col].isin(["New", "Pending"]))
-            ].head(5)
-            
-            if not high_priority_pending.empty:
-                # Display each task with quick update option
-                for idx, task in high_priority_pending.iterrows():
-                    with st.container():
-                        col_a, col_b = st.columns([4, 1])
-                        
-                        with col_a:
-                            task_title = task.get(task_title_col, 'N/A')
-                            st.write(f"**{task_title}**")
-                            st.caption(f"⏰ Deadline: {task.get('Deadline Date', 'N/A')} | 👤 {task.get('Assigned To', 'N/A')}")
-                        
-                        with col_b:
-                            # Navigate to Manage Tasks button
-                            if st.button("Start", key=f"quick_start_{idx}", help="Go to Manage Tasks", width="stretch"):
-                                st.session_state.selected_page = "Manage Tasks"
-                                st.rerun()
-                        
-                        st.divider()
-            else:
-                st.success("✅ No high priority pending tasks")
-        else:
-            st.info("No tasks available")
-
-elif st.session_state.selected_page == "Approve Leads":
-    # ========================================
-    # APPROVE LEADS PAGE
-    # ========================================
-    
-    st.header("📧 Approve Leads for Outreach")
-    st.write("Review and approve leads for DIANA to send outreach emails")
+    # Display leads with checkboxes in container with fixed height
+    selected_donor_ids = []
     
-    df = load_daphne_data()
+    # Create scrollable container
+    leads_container = st.container(height=500)
     
-    if df.empty:
-        st.info("No leads available. Run DAPHNE to generate leads.")
-    else:
-        # Metrics
-        col1, col2, col3, col4 = st.columns(4)
+    with leads_container:
+        # HEADER ROW with Select All checkbox
+        col1, col2, col3, col4, col5 = st.columns([0.5, 2, 2.5, 2, 1.5])
         
         with col1:
-            st.metric("Total Leads", len(df))
+            # Get all donor IDs (and their row checkbox keys) from filtered dataframe
+            row_keys = []
+            for idx, row in filtered_df.iterrows():
+                donor_id = row.get('Donor ID') or row.get('Lead ID', '')
+                if donor_id:
+                    row_keys.append((f"prospect_check_{donor_id}_{idx}", donor_id))
+            all_donor_ids = {donor_id for _, donor_id in row_keys}
+            
+            # Prospects already sent to DIANA can't be selected again
+            approved_ids = get_approval_ledger().approved_among(all_donor_ids)
+            all_donor_ids -= approved_ids
+            
+            # Keep Select All in step with the selection (rows may have been
+            # unticked one by one, or the selection cleared by a refresh)
+            st.session_state.select_all_checkbox = (
+                all_donor_ids.issubset(st.session_state.selected_prospects) if all_donor_ids else False
+            )
+            
+            # Select All checkbox; the callback applies it before this rerun draws the rows
+            st.checkbox(
+                "Select All",
+                key="select_all_checkbox",
+                on_change=_apply_select_all,
+                args=([(key, donor_id) for key, donor_id in row_keys if donor_id not in approved_ids],)
+            )
         
         with col2:
-            today = datetime.now().strftime("%Y-%m-%d")
-            today_count = df["timestamp"].str.contains(today, na=False).sum() if "timestamp" in df.columns else 0
-            st.metric("Today", today_count)
+            st.markdown("**Name**")
         
         with col3:
-            cities = df["organization"].str.contains("City", case=False, na=False).sum() if "organization" in df.columns else 0
-            st.metric("Cities", cities)
+            st.markdown("**Organization**")
         
         with col4:
-            churches = df["organization"].str.contains("Church", case=False, na=False).sum() if "organization" in df.columns else 0
-            st.metric("Churches", churches)
+            st.markdown("**Email**")
         
+        with col5:
+            st.markdown("**Donor ID**")
+        
+        # Separator line
         st.markdown("---")
         
-        # ========================================
-        # APPROVE LEADS SECTION
-        # ========================================
-        if 'Donor ID' in df.columns or 'Lead ID' in df.columns:
-            st.markdown("### Select Prospects to Approve")
-            
-            # Search filter FIRST
-            search_approve = st.text_input("🔍 Search prospects...", key="search_approve_filter")
-            
-            # Filter dataframe based on search
-            filtered_df = df.copy()
-            if search_approve:
-                search_lower = search_approve.lower()
-                mask = (
-                    df.get('Name', pd.Series(dtype='str')).str.lower().str.contains(search_lower, na=False) |
-                    df.get('Email', pd.Series(dtype='str')).str.lower().str.contains(search_lower, na=False) |
-                    df.get('Organization', pd.Series(dtype='str')).str.lower().str.contains(search_lower, na=False)
-                )
-                filtered_df = df[mask]
+        # DATA ROWS
+        for idx, row in filtered_df.iterrows():
+            donor_id = row.get('Donor ID') or row.get('Lead ID', '')
             
-            st.markdown(f"**Showing {len(filtered_df)} of {len(df)} prospects**")
-            
-            # Button row (without Select All)
-            col1, col2, col3 = st.columns([2, 2, 2])
+            col1, col2, col3, col4, col5 = st.columns([0.5, 2, 2.5, 2, 1.5])
             
             with col1:
-                if st.button("🔄 Refresh Data", width="stretch", key="refresh_top"):
-                    st.cache_data.clear()
-                    if 'selected_prospects' in st.session_state:
-                        st.session_state.selected_prospects = set()
-                    st.rerun()
-            
-            with col2:
-                approve_btn_top = st.button(
-                    "✅ Approve Selected Prospects",
-                    type="primary",
-                    width="stretch",
-                    key="approve_top"
-                )
-            
-            with col3:
-                # CSV Download button
-                if len(filtered_df) > 0:
-                    csv = filtered_df.to_csv(index=False)
-                    st.download_button(
-                        "📥 Download CSV",
-                        csv,
-                        f"prospects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        "text/csv",
-                        width="stretch"
-                    )
-            
-            st.markdown("---")
-            
-            # Initialize session state for selections
-            if 'selected_prospects' not in st.session_state:
-                st.session_state.selected_prospects = set()
-            
-            # Display leads with checkboxes in container with fixed height
-            selected_donor_ids = []
-            
-            # Create scrollable container
-            leads_container = st.container(height=500)
-            
-            with leads_container:
-                # HEADER ROW with Select All checkbox
-                col1, col2, col3, col4, col5 = st.columns([0.5, 2, 2.5, 2, 1.5])
+                # Check if this prospect is in the selected set
+                is_approved = donor_id in approved_ids
+                is_checked = donor_id in st.session_state.selected_prospects if donor_id and not is_approved else False
                 
-                with col1:
-                    # Get all donor IDs from filtered dataframe
-                    all_donor_ids = set()
-                    for _, row in filtered_df.iterrows():
-                        donor_id = row.get('Donor ID') or row.get('Lead ID', '')
-                        if donor_id:
-                            all_donor_ids.add(donor_id)
-                    
-                    # Check if all visible prospects are selected
-                    all_selected = all_donor_ids.issubset(st.session_state.selected_prospects) if all_donor_ids else False
-                    
-                    # Select All checkbox
-                    select_all = st.checkbox(
-                        "Select All",
-                        value=all_selected,
-                        key="select_all_checkbox"
-                    )
-                    
-                    # Handle Select All toggle
-                    if select_all and not all_selected:
-                        # User just checked Select All - add all visible prospects
-                        st.session_state.selected_prospects.update(all_donor_ids)
-                        st.rerun()
-                    elif not select_all and all_selected:
-                        # User just unchecked Select All - remove all visible prospects
-                        st.session_state.selected_prospects -= all_donor_ids
-                        st.rerun()
-                
-                with col2:
-                    st.markdown("**Name**")
-                
-                with col3:
-                    st.markdown("**Organization**")
-                
-                with col4:
-                    st.markdown("**Email**")
-                
-                with col5:
-                    st.markdown("**Donor ID**")
-                
-                # Separator line
-                st.markdown("---")
+                # The selection set is the source of truth; callbacks update it
+                # before the rerun, so the box just mirrors it
+                check_key = f"prospect_check_{donor_id}_{idx}"
+                st.session_state[check_key] = is_checked
+                st.checkbox(
+                    "✓",
+                    key=check_key,
+                    on_change=_toggle_prospect,
+                    args=(check_key, donor_id),
+                    label_visibility="collapsed",
+                    disabled=is_approved or not donor_id,
+                    help="Already approved" if is_approved else None
+                )
                 
-                # DATA ROWS
-                for idx, row in filtered_df.iterrows():
-                    donor_id = row.get('Donor ID') or row.get('Lead ID', '')
-                    
-                    col1, col2, col3, col4, col5 = st.columns([0.5, 2, 2.5, 2, 1.5])
-                    
-                    with col1:
-                        # Check if this prospect is in the selected set
-                        is_checked = donor_id in st.session_state.selected_prospects if donor_id else False
-                        
-                        checkbox_changed = st.checkbox(
-                            "✓",
-                            value=is_checked,
-                            key=f"prospect_check_{donor_id}_{idx}",
-                            label_visibility="collapsed"
-                        )
-                        
-                        # Update session state based on checkbox
-                        if checkbox_changed and not is_checked:
-                            # User just checked this box
-                            if donor_id:
-                                st.session_state.selected_prospects.add(donor_id)
-                        elif not checkbox_changed and is_checked:
-                            # User just unchecked this box
-                            if donor_id:
-                                st.session_state.selected_prospects.discard(donor_id)
-                        
-                        # Add to current selection list
-                        if donor_id in st.session_state.selected_prospects:
-                            selected_donor_ids.append(donor_id)
-                    
-                    with col2:
-                        st.write(f"**{row.get('Name', 'N/A')}**")
-                    
-                    with col3:
-                        st.write(row.get('Organization', 'N/A'))
-                    
-                    with col4:
-                        email = row.get('Email', 'N/A')
-                        st.write(email[:25] + '...' if len(str(email)) > 25 else email)
-                    
-                    with col5:
-                        st.code(row.get('Donor ID') or row.get('Lead ID', 'N/A'), language=None)
-            
-            st.markdown("---")
-            
-            # Approval controls
-            col1, col2, col3 = st.columns([2, 2, 2])
-            
-            with col1:
-                st.metric("Selected", len(selected_donor_ids))
+                # Add to current selection list
+                if donor_id in st.session_state.selected_prospects and not is_approved:
+                    selected_donor_ids.append(donor_id)
             
             with col2:
-                approve_btn_bottom = st.button(
-                    "✅ Approve Selected Leads",
-                    type="primary",
-                    width="stretch",
-                    disabled=len(selected_donor_ids) == 0,
-                    key="approve_bottom"
-                )
+                st.write(f"**{row.get('Name', 'N/A')}**")
             
             with col3:
-                if st.button("🔄 Refresh Data", width="stretch"):
-                    st.cache_data.clear()
-                    st.rerun()
+                st.write(row.get('Organization', 'N/A'))
             
-            # Handle approval from either button
-            if approve_btn_top or approve_btn_bottom:
-                if selected_donor_ids:
-                    with st.spinner("Sending to DIANA..."):
-                        success, response = send_approved_leads_to_diana(selected_donor_ids)
-                        
-                        if success:
-                            st.success(f"✅ Successfully approved {len(selected_donor_ids)} prospect(s)!")
-                            st.info("🤖 DIANA will send outreach emails shortly.")
-                            
-                            # Clear selections after successful approval
-                            st.session_state.selected_prospects = set()
-                            
-                            # Show approved leads
-                            with st.expander("View Approved Leads"):
-                                for donor_id in selected_donor_ids:
-                                    st.write(f"• {donor_id}")
-                        else:
-                            st.error(f"❌ Failed to send to DIANA: {response}")
-                            st.info("💡 Check that the DIANA webhook is running in n8n")
-                else:
-                    st.warning("⚠️ Please select at least one lead to approve")
-        
-        st.markdown("---")
-        
-        # ========================================
-        # SEARCH AND FILTER
-        # ========================================
-        search = st.text_input("🔍 Search leads by name, email, or organization...")
-        filtered = df.copy()
-        
-        if search:
-            mask = (
-                df["name"].str.contains(search, case=False, na=False) |
-                df["email"].str.contains(search, case=False, na=False) |
-                df["organization"].str.contains(search, case=False, na=False)
-            )
-            filtered = df[mask]
-        
-        # ========================================
-        # LEADS TABLE
-        # ========================================
-        st.subheader(f"All Leads ({len(filtered)})")
-        
-        if not filtered.empty:
-            st.dataframe(filtered, width="stretch", hide_index=True)
+            with col4:
+                email = row.get('Email', 'N/A')
+                st.write(email[:25] + '...' if len(str(email)) > 25 else email)
             
-            # Export button
-            csv = filtered.to_csv(index=False)
-            st.download_button(
-                "📥 Export to CSV",
-                csv,
-                f"daphne_leads_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                "text/csv",
-                width="content"
-            )
-        else:
-            st.info("No leads match your search criteria.")
-
-elif st.session_state.selected_page == "Manage Tasks":
-    # ========================================
-    # MANAGE TASKS PAGE (OPSI)
-    # ========================================
-    
-    # Scroll anchor at top
-    st.markdown('<div id="manage-tasks-top"></div>', unsafe_allow_html=True)
+            with col5:
+                st.code(row.get('Donor ID') or row.get('Lead ID', 'N/A'), language=None)
+                if is_approved:
+                    st.caption("✅ Approved")
     
-    st.header("📋 Manage Tasks")
-    st.write("Create and track compliance tasks, deadlines, and operations")
-    
-    opsi_df = load_opsi_data()
-    
-    # Determine column names (handle trailing spaces)
-    status_col = "Status " if "Status " in opsi_df.columns else "Status"
-    priority_col = "Priority " if "Priority " in opsi_df.columns else "Priority"
-    task_id_col = "Task ID" if "Task ID" in opsi_df.columns else "OPSI ID"
-    task_title_col = "Task Title" if "Task Title" in opsi_df.columns else "Title"
+    st.markdown("---")
     
-    # Metrics
-    col1, col2, col3, col4 = st.columns(4)
+    # Approval controls
+    col1, col2, col3 = st.columns([2, 2, 2])
     
     with col1:
-        pending = len(opsi_df[opsi_df[status_col] == "New"]) if not opsi_df.empty else 0
-        st.metric("Pending", pending)
+        st.metric("Selected", len(selected_donor_ids))
     
     with col2:
-        in_progress = len(opsi_df[opsi_df[status_col] == "In Progress"]) if not opsi_df.empty else 0
-        st.metric("In Progress", in_progress)
+        approve_btn_bottom = st.button(
+            "✅ Approve Selected Leads",
+            type="primary",
+            width="stretch",
+            disabled=len(selected_donor_ids) == 0,
+            key="approve_bottom"
+        )
     
     with col3:
-        high = len(opsi_df[opsi_df[priority_col] == "High"]) if not opsi_df.empty else 0
-        st.metric("High Priority", high)
-    
-    with col4:
-        st.metric("Total Tasks", len(opsi_df))
-    
-    st.markdown("---")
-    
-    # ========================================
-    # CREATE TASK
-    # ========================================
-    
-    # Show success message if it exists in session state
-    if 'create_success_msg' in st.session_state:
-        st.success(st.session_state.create_success_msg)
-        del st.session_state.create_success_msg
+        if st.button("🔄 Refresh Data", width="stretch"):
+            clear_data_caches()
+            st.rerun()
     
-    with st.expander("➕ Create New Task", expanded=False):
-        with st.form("task_form"):
-            
-            title = st.text_input("Task Title*")
-            
-            task_type = st.selectbox(
-                "Task Type*",
-                ["Select option", "RFP Submission", "Contract Renewal", "Audit", "Compliance Report", "Other"]
-            )
-            
-            assigned_to = st.text_input("Assigned To*", placeholder="Enter person name")
-            
-            deadline = st.date_input("Deadline Date*")
-            
-            priority = st.selectbox(
-                "Priority*",
-                ["Select option", "High", "Medium", "Low"]
-            )
-            
-            notes = st.text_area("Notes")
-            
-            submitted = st.form_submit_button("Create Task")
-            
-            if submitted:
-                errors = []
-                
-                if not title.strip():
-                    errors.append("Task title is required.")
-                if task_type == "Select option":
-                    errors.append("Task type is required.")
-                if priority == "Select option":
-                    errors.append("Priority is required.")
-                if not assigned_to.strip():
-                    errors.append("Assigned To is required.")
+    # Handle approval from either button
+    if approve_btn_top or approve_btn_bottom:
+        new_donor_ids, already_approved = get_approval_ledger().split(selected_donor_ids)
+        if already_approved:
+            st.warning(f"⚠️ Skipping {len(already_approved)} prospect(s) already approved")
+            st.session_state.selected_prospects -= set(already_approved)
+        
+        if new_donor_ids:
+            with st.spinner("Sending to DIANA..."):
+                success, response = send_approved_leads_to_diana(new_donor_ids)
                 
-                if errors:
-                    for e in errors:
-                        st.error(e)
-                else:
-                    task_data = {
-                        "title": title,
-                        "taskType": task_type,
-                        "assignedTo": assigned_to,
-                        "deadline": str(deadline),
-                        "priority": priority,
-                        "notes": notes,
-                    }
+                if success:
+                    st.success(f"✅ Successfully approved {len(new_donor_ids)} prospect(s)!")
+                    st.info("🤖 DIANA will send outreach emails shortly.")
                     
-                    # Show processing message
-                    with st.spinner("Creating task..."):
-                        result = send_opsi_task(task_data)
+                    # Clear selections after successful approval
+                    st.session_state.selected_prospects = set()
                     
-                    if result:
-                        # Store success message in session state before rerun
-                        st.session_state.create_success_msg = f"✅ Task '{title}' created successfully!"
-                        st.cache_data.clear()
-                        st.markdown("""
-                        <script>
-                            window.parent.document.querySelector('[data-testid="stAppViewContainer"]').scrollTop = 0;
-                        </script>
-                        """, unsafe_allow_html=True)
-                        st.rerun()
-                    else:
-                        st.error("❌ Failed to create task. Check that the OPSI webhook is running in n8n.")
+                    # Show approved leads
+                    with st.expander("View Approved Leads"):
+                        for donor_id in new_donor_ids:
+                            st.write(f"• {donor_id}")
+                else:
+                    st.error(f"❌ Failed to send to DIANA: {response}")
+                    st.info("💡 Check that the DIANA webhook is running in n8n")
+        elif not already_approved:
+            st.warning("⚠️ Please select at least one lead to approve")
+
+@st.fragment
+def all_leads_table(df):
+    """Searchable table of every DAPHNE lead with CSV export"""
+    # Search and filter
+    col1, col2 = st.columns([3, 1])
     
-    # ========================================
-    # UPDATE TASK SECTION
-    # ========================================
+    with col1:
+        search = st.text_input("🔍 Search leads by name, email, or organization...")
     
-    # Show success message if it exists in session state
-    if 'update_success_msg' in st.session_state:
-        st.success(st.session_state.update_success_msg)
-        del st.session_state.update_success_msg
+    with col2:
+        org_types = st.multiselect("Organization type", ORG_TYPES, key="all_leads_org_types")
+    
+    filtered = df
+    if org_types and "org_type" in df.columns:
+        filtered = filtered[filtered["org_type"].isin(org_types)]
+    filtered = search_leads(filtered, search)
     
+    # Leads table
+    st.subheader(f"All Leads ({len(filtered)})")
+    
+    if not filtered.empty:
+        windowed_table(filtered, key="all_leads")
+        
+        # Export button; the CSV is built on click, not on every page or sort change
+        st.download_button(
+            "📥 Export to CSV",
+            partial(filtered.to_csv, index=False),
+            f"daphne_leads_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            "text/csv",
+            width="content"
+        )
+    else:
+        st.info("No leads match your search criteria.")
+
+@st.fragment
+def task_update_editor(opsi_df, status_col, priority_col, task_id_col, task_title_col):
+    """Task search, selector and edit fields; keystrokes only rerun this region"""
     # Keep expander open if search is active OR task is selected
     is_expanded = (st.session_state.get('task_id_search', '') != '' or 
                    st.session_state.get('selected_task_id') is not None)
@@ -665,20 +443,15 @@ elif st.session_state.selected_page == "Manage Tasks":
         # Update session state
         st.session_state.task_id_search = task_id_search
         
-        # Filter tasks based on search
+        # Type-ahead: bounded list of Task IDs matching the typed prefix
         if not opsi_df.empty and task_id_col in opsi_df.columns and task_title_col in opsi_df.columns:
-            filtered_opsi_df = opsi_df.copy()
-            
-            if task_id_search.strip():
-                filtered_opsi_df = opsi_df[
-                    opsi_df[task_id_col].str.contains(task_id_search, case=False, na=False)
-                ]
+            task_index = get_task_id_index(opsi_df, task_id_col, task_title_col)
+            candidate_ids = task_index.search(task_id_search)
             
-            if not filtered_opsi_df.empty:
-                task_options = {
-                    f"{row[task_id_col]} - {row[task_title_col]}": row[task_id_col] 
-                    for _, row in filtered_opsi_df.iterrows()
-                }
+            if candidate_ids:
+                task_options = {task_index.label(task_id): task_id for task_id in candidate_ids}
+                if len(candidate_ids) == MAX_TASK_CANDIDATES:
+                    st.caption(f"Showing the first {MAX_TASK_CANDIDATES} matches. Keep typing to narrow the list.")
                 
                 # Initialize selected task in session state
                 if 'selected_task_id' not in st.session_state:
@@ -702,7 +475,7 @@ elif st.session_state.selected_page == "Manage Tasks":
                     st.session_state.selected_task_id = selected_task_id
                     
                     # Get current task details
-                    task_row = opsi_df[opsi_df[task_id_col] == selected_task_id].iloc[0]
+                    task_row = task_index.get(selected_task_id)
                     
                     col1, col2 = st.columns(2)
                     
@@ -808,7 +581,7 @@ elif st.session_state.selected_page == "Manage Tasks":
                                 # Clear search and selection on successful update
                                 st.session_state.task_id_search = ""
                                 st.session_state.selected_task_id = None
-                                st.cache_data.clear()
+                                clear_data_caches()
                                 st.markdown("""
                                 <script>
                                     window.parent.document.querySelector('[data-testid="stAppViewContainer"]').scrollTop = 0;
@@ -821,33 +594,421 @@ elif st.session_state.selected_page == "Manage Tasks":
                 st.warning(f"⚠️ No tasks found matching '{task_id_search}'")
         else:
             st.warning("⚠️ Task ID or Title column not found in data")
+
+@st.fragment
+def active_tasks_table(opsi_df, task_title_col):
+    """Searchable table of OPSI tasks"""
+    if not opsi_df.empty:
+        # Add search/filter
+        search_task = st.text_input("🔍 Search tasks by title, assignee, or type...", key="task_search")
+        
+        filtered_tasks = search_tasks(opsi_df, search_task)
+        
+        windowed_table(filtered_tasks, key="active_tasks")
+    else:
+        st.info("No tasks found. Create your first task above.")
+
+# ========================================
+# PAGE ROUTING
+# ========================================
+
+if st.session_state.selected_page == "Dashboard Overview":
+    # ========================================
+    # DASHBOARD OVERVIEW PAGE
+    # ========================================
+    
+    # Each panel names the data sources it needs; only sources for the visible
+    # panels are loaded, all at once in parallel
+    overview_panels = {
+        "Agent Status": [],
+        "Quick Metrics": metric_sources(),
+        "Outreach Funnel": ["daphne.leads", "diana.outreach"],
+        "Recent Leads": ["daphne.leads"],
+        "High Priority Tasks": ["opsi.tasks"],
+        "Lead Activity": ["daphne.leads"],
+        "Activity Feed": [],
+    }
+    with st.sidebar:
+        visible_panels = st.multiselect(
+            "Overview panels:",
+            list(overview_panels),
+            default=list(overview_panels),
+            key="overview_panels"
+        )
+    data = load_sources(name for panel in visible_panels for name in overview_panels[panel])
+    
+    # Agent Status Cards
+    if "Agent Status" in visible_panels:
+        for col, agent in zip(st.columns(len(agents)), agents):
+            with col:
+                status = agent_statuses[agent.key]
+                status_badge = f'<span class="{status_class_map.get(status, "status-offline")}">{status.upper()}</span>'
+                st.markdown(f"""
+                <div class="agent-card">
+                    <h3>{agent.icon} {agent.name}</h3>
+                    <p>{agent.description}</p>
+                    <div style="margin-top: 1rem;">
+                        {status_badge}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        st.markdown("---")
+    
+    # Quick Metrics
+    if "Quick Metrics" in visible_panels:
+        quick_metrics = {label: value for agent in agents if agent.metrics for label, value in agent.metrics(data).items()}
+        for col, (label, value) in zip(st.columns(len(quick_metrics)), quick_metrics.items()):
+            with col:
+                st.metric(label, value)
+    
+    # Outreach Funnel
+    if "Outreach Funnel" in visible_panels:
+        st.markdown("### 📧 Outreach Funnel")
+        funnel = get_outreach_funnel(len(data["daphne.leads"]), len(get_approval_ledger()), data["diana.outreach"])
+        for col, (stage, count) in zip(st.columns(len(funnel)), funnel.items()):
+            with col:
+                st.metric(stage, count)
+        
+        st.markdown("---")
+    
+    # Recent Activity - Two Columns
+    if "Recent Leads" in visible_panels or "High Priority Tasks" in visible_panels:
+        col1, col2 = st.columns([1, 1])
+    
+    if "Recent Leads" in visible_panels:
+        with col1:
+            st.markdown("### 📊 Recent Leads")
+            if not data["daphne.leads"].empty:
+                recent_df = get_recent_leads(5)
+                st.dataframe(recent_df, width="stretch", hide_index=True)
+                
+                # Add Approve Leads button
+                if st.button("Approve Leads", width="stretch", type="primary"):
+                    st.session_state.selected_page = "Approve Leads"
+                    st.rerun()
+            else:
+                st.info("No recent leads. Run DAPHNE to generate leads.")
+    
+    if "High Priority Tasks" in visible_panels:
+        with col2:
+            st.markdown("### 🔥 High Priority Pending Tasks")
+            opsi_tasks = data["opsi.tasks"]
+            if not opsi_tasks.empty:
+                # Determine column names (handle trailing spaces)
+                status_col = "Status " if "Status " in opsi_tasks.columns else "Status"
+                priority_col = "Priority " if "Priority " in opsi_tasks.columns else "Priority"
+                task_id_col = "Task ID" if "Task ID" in opsi_tasks.columns else "OPSI ID"
+                task_title_col = "Task Title" if "Task Title" in opsi_tasks.columns else "Title"
+                
+                # Filter for High Priority + New/Pending status, most urgent deadline first
+                high_priority_pending = sort_by_deadline(opsi_tasks[
+                    (opsi_tasks[priority_col] == "High") & 
+                    (opsi_tasks[status_col].isin(["New", "Pending"]))
+                ]).head(5)
+                overdue_rows = set(get_deadline_index().overdue().index)
+                
+                if not high_priority_pending.empty:
+                    # Display each task with quick update option
+                    for idx, task in high_priority_pending.iterrows():
+                        with st.container():
+                            col_a, col_b = st.columns([4, 1])
+                            
+                            with col_a:
+                                task_title = task.get(task_title_col, 'N/A')
+                                st.write(f"**{task_title}**")
+                                overdue_flag = " | 🚨 Overdue" if idx in overdue_rows else ""
+                                st.caption(f"⏰ Deadline: {task.get('Deadline Date', 'N/A')} | 👤 {task.get('Assigned To', 'N/A')}{overdue_flag}")
+                            
+                            with col_b:
+                                # Navigate to Manage Tasks button
+                                if st.button("Start", key=f"quick_start_{idx}", help="Go to Manage Tasks", width="stretch"):
+                                    st.session_state.selected_page = "Manage Tasks"
+                                    st.rerun()
+                            
+                            st.divider()
+                else:
+                    st.success("✅ No high priority pending tasks")
+            else:
+                st.info("No tasks available")
+    
+    # Lead Activity Feed
+    if "Lead Activity" in visible_panels:
+        st.markdown("---")
+        st.markdown("### 🕒 Lead Activity")
+        activity_windows = {
+            "Last 24 hours": timedelta(days=1),
+            "Last 7 days": timedelta(days=7),
+            "Last 30 days": timedelta(days=30),
+        }
+        activity_window = st.radio(
+            "Time window:",
+            list(activity_windows.keys()),
+            horizontal=True,
+            key="lead_activity_window",
+            label_visibility="collapsed"
+        )
+        now = local_now()
+        window_leads = get_leads_between(now - activity_windows[activity_window], now)
+        
+        if not window_leads.empty:
+            st.caption(f"{len(window_leads)} lead(s) added in the {activity_window.lower()}")
+            st.dataframe(window_leads, width="stretch", hide_index=True)
+        else:
+            st.info(f"No leads added in the {activity_window.lower()}.")
+    
+    if "Activity Feed" in visible_panels:
+        st.markdown("---")
+        
+        activity_feed()
+
+elif st.session_state.selected_page == "Approve Leads":
+    # ========================================
+    # APPROVE LEADS PAGE
+    # ========================================
+    
+    st.header("📧 Approve Leads for Outreach")
+    st.write("Review and approve leads for DIANA to send outreach emails")
+    
+    data = load_sources(["daphne.leads", "diana.outreach"])
+    df = data["daphne.leads"]
+    
+    if df.empty:
+        st.info("No leads available. Run DAPHNE to generate leads.")
+    else:
+        # Metrics
+        col1, col2, col3, col4 = st.columns(4)
+        lead_counts = lead_metrics(df)
+        
+        with col1:
+            st.metric("Total Leads", lead_counts["total_leads"])
+        
+        with col2:
+            st.metric("Today", get_lead_count_on(local_now()))
+        
+        with col3:
+            st.metric("Cities", lead_counts["cities"])
+        
+        with col4:
+            st.metric("Churches", lead_counts["churches"])
+        
+        # ========================================
+        # LEAD TRENDS
+        # ========================================
+        rollups = get_lead_rollups()
+        
+        with st.expander("📈 Lead Trends", expanded=False):
+            if rollups:
+                first_day = rollups[("daily", "Status")].index.min().date()
+                last_day = rollups[("daily", "Status")].index.max().date()
+                
+                col1, col2, col3 = st.columns([2, 1, 1])
+                
+                with col1:
+                    date_range = st.date_input(
+                        "Date range:",
+                        value=(max(first_day, last_day - timedelta(weeks=8)), last_day),
+                        min_value=first_day,
+                        max_value=last_day,
+                        key="lead_trend_range"
+                    )
+                
+                with col2:
+                    trend_group = st.selectbox("Group by:", ["Status", "Org Type"], key="lead_trend_group")
+                
+                with col3:
+                    trend_granularity = st.selectbox("Granularity:", ["Weekly", "Daily"], key="lead_trend_granularity")
+                
+                # Range picker returns a single date until the end is chosen
+                range_start, range_end = (date_range[0], date_range[-1]) if date_range else (first_day, last_day)
+                # Weekly buckets are labelled by their Monday: start from the week containing range_start
+                bucket_start = range_start - timedelta(days=range_start.weekday()) if trend_granularity == "Weekly" else range_start
+                trend = rollups[(trend_granularity.lower(), trend_group)]
+                trend = trend.loc[str(bucket_start):str(range_end)]
+                
+                # Count exactly the chosen days, not the whole first and last weeks
+                daily = rollups[("daily", trend_group)].loc[str(range_start):str(range_end)]
+                st.metric("Leads in range", int(daily["Total"].sum()))
+                st.bar_chart(trend.drop(columns="Total"))
+            else:
+                st.info("No timestamped leads to chart yet.")
+        
+        st.markdown("---")
+        
+        # ========================================
+        # APPROVE LEADS SECTION
+        # ========================================
+        if 'Donor ID' in df.columns or 'Lead ID' in df.columns:
+            prospect_selection_grid(df)
+        
+        st.markdown("---")
+        
+        all_leads_table(with_outreach_status(df, data["diana.outreach"]))
+
+elif st.session_state.selected_page == "Manage Tasks":
+    # ========================================
+    # MANAGE TASKS PAGE (OPSI)
+    # ========================================
+    
+    # Scroll anchor at top
+    st.markdown('<div id="manage-tasks-top"></div>', unsafe_allow_html=True)
+    
+    st.header("📋 Manage Tasks")
+    st.write("Create and track compliance tasks, deadlines, and operations")
+    
+    opsi_df = load_sources(["opsi.tasks"])["opsi.tasks"]
+    
+    # Determine column names (handle trailing spaces)
+    status_col = "Status " if "Status " in opsi_df.columns else "Status"
+    priority_col = "Priority " if "Priority " in opsi_df.columns else "Priority"
+    task_id_col = "Task ID" if "Task ID" in opsi_df.columns else "OPSI ID"
+    task_title_col = "Task Title" if "Task Title" in opsi_df.columns else "Title"
+    
+    # Metrics
+    col1, col2, col3, col4 = st.columns(4)
+    task_counts = task_metrics(opsi_df, get_deadline_index())
+    
+    with col1:
+        st.metric("Pending", task_counts["pending"])
+    
+    with col2:
+        st.metric("In Progress", task_counts["in_progress"])
+    
+    with col3:
+        st.metric("High Priority", task_counts["high_priority"])
+    
+    with col4:
+        st.metric("Total Tasks", task_counts["total_tasks"])
     
     st.markdown("---")
     
     # ========================================
-    # ACTIVE TASKS
+    # DEADLINES
     # ========================================
-    st.subheader("Active Tasks")
+    deadline_index = get_deadline_index()
     
-    if not opsi_df.empty:
-        # Add search/filter
-        search_task = st.text_input("🔍 Search tasks by title, assignee, or type...", key="task_search")
+    with st.expander(f"⏰ Deadlines ({deadline_index.overdue_count()} overdue)", expanded=deadline_index.overdue_count() > 0):
+        due_days = st.number_input("Due within (days):", min_value=1, max_value=365, value=7, key="due_within_days")
+        
+        overdue_tab, due_soon_tab, next_tab = st.tabs([
+            f"🚨 Overdue ({deadline_index.overdue_count()})",
+            f"📅 Due in {due_days} days ({deadline_index.due_within_count(due_days)})",
+            "⏭️ Next 10 Deadlines"
+        ])
         
-        filtered_tasks = opsi_df.copy()
-        if search_task:
-            assigned_col = "Assigned To" if "Assigned To" in opsi_df.columns else "AssignedTo"
-            task_type_col = "Task Type" if "Task Type" in opsi_df.columns else "TaskType"
+        for tab, label, tasks in (
+            (overdue_tab, "overdue", deadline_index.overdue()),
+            (due_soon_tab, f"due_{due_days}d", deadline_index.due_within(due_days)),
+            (next_tab, "next_deadlines", deadline_index.next_deadlines(10)),
+        ):
+            with tab:
+                if not tasks.empty:
+                    st.dataframe(tasks, hide_index=True, width="stretch")
+                    st.download_button(
+                        "📥 Export to CSV",
+                        partial(tasks.to_csv, index=False),
+                        f"opsi_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                        "text/csv",
+                        key=f"export_{label}"
+                    )
+                else:
+                    st.success("✅ Nothing here")
+    
+    st.markdown("---")
+    
+    # ========================================
+    # CREATE TASK
+    # ========================================
+    
+    # Show success message if it exists in session state
+    if 'create_success_msg' in st.session_state:
+        st.success(st.session_state.create_success_msg)
+        del st.session_state.create_success_msg
+    
+    with st.expander("➕ Create New Task", expanded=False):
+        with st.form("task_form"):
+            
+            title = st.text_input("Task Title*")
             
-            mask = (
-                opsi_df[task_title_col].str.contains(search_task, case=False, na=False) |
-                opsi_df.get(assigned_col, pd.Series(dtype='object')).str.contains(search_task, case=False, na=False) |
-                opsi_df.get(task_type_col, pd.Series(dtype='object')).str.contains(search_task, case=False, na=False)
+            task_type = st.selectbox(
+                "Task Type*",
+                ["Select option", "RFP Submission", "Contract Renewal", "Audit", "Compliance Report", "Other"]
             )
-            filtered_tasks = opsi_df[mask]
-        
-        st.dataframe(filtered_tasks, hide_index=True, width="stretch")
-    else:
-        st.info("No tasks found. Create your first task above.")
+            
+            assigned_to = st.text_input("Assigned To*", placeholder="Enter person name")
+            
+            deadline = st.date_input("Deadline Date*")
+            
+            priority = st.selectbox(
+                "Priority*",
+                ["Select option", "High", "Medium", "Low"]
+            )
+            
+            notes = st.text_area("Notes")
+            
+            submitted = st.form_submit_button("Create Task")
+            
+            if submitted:
+                errors = []
+                
+                if not title.strip():
+                    errors.append("Task title is required.")
+                if task_type == "Select option":
+                    errors.append("Task type is required.")
+                if priority == "Select option":
+                    errors.append("Priority is required.")
+                if not assigned_to.strip():
+                    errors.append("Assigned To is required.")
+                
+                if errors:
+                    for e in errors:
+                        st.error(e)
+                else:
+                    task_data = {
+                        "title": title,
+                        "taskType": task_type,
+                        "assignedTo": assigned_to,
+                        "deadline": str(deadline),
+                        "priority": priority,
+                        "notes": notes,
+                    }
+                    
+                    # Show processing message
+                    with st.spinner("Creating task..."):
+                        result = send_opsi_task(task_data)
+                    
+                    if result:
+                        # Store success message in session state before rerun
+                        st.session_state.create_success_msg = f"✅ Task '{title}' created successfully!"
+                        clear_data_caches()
+                        st.markdown("""
+                        <script>
+                            window.parent.document.querySelector('[data-testid="stAppViewContainer"]').scrollTop = 0;
+                        </script>
+                        """, unsafe_allow_html=True)
+                        st.rerun()
+                    else:
+                        st.error("❌ Failed to create task. Check that the OPSI webhook is running in n8n.")
+    
+    # ========================================
+    # UPDATE TASK SECTION
+    # ========================================
+    
+    # Show success message if it exists in session state
+    if 'update_success_msg' in st.session_state:
+        st.success(st.session_state.update_success_msg)
+        del st.session_state.update_success_msg
+    
+    task_update_editor(opsi_df, status_col, priority_col, task_id_col, task_title_col)
+    
+    st.markdown("---")
+    
+    # ========================================
+    # ACTIVE TASKS
+    # ========================================
+    st.subheader("Active Tasks")
+    
+    active_tasks_table(opsi_df, task_title_col)
 
 # ========================================
 # FOOTER
@@ -862,3 +1023,5 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+finish_page_profile()
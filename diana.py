@@ -1,5 +1,185 @@
 import streamlit as st
+import pandas as pd
+import os
+import threading
+import time
+from gspread.utils import rowcol_to_a1
+from activity import read_jsonl_since
+from agents import Agent, DataSource, register
+from config import get_setting
+from utils import connect_to_sheets, snapshot_id
 
 def get_diana_status():
     """Return DIANA agent status"""
     return "Active"
+
+# ========================================
+# OUTREACH EVENTS (INCREMENTAL)
+# ========================================
+
+# Funnel stages in order; a donor's status is the furthest stage reached
+OUTREACH_STAGES = ["Sent", "Delivered", "Opened", "Replied"]
+STAGE_RANK = {stage.lower(): rank for rank, stage in enumerate(OUTREACH_STAGES)}
+POLL_INTERVAL = 60  # seconds between checks for new events
+
+class OutreachEventStore:
+    """Per-donor outreach status, built from DIANA events read incrementally.
+
+    Events come from the DIANA sheet (DIANA_SHEET_ID) or a JSONL log
+    (DIANA_EVENTS_LOG). A cursor - next sheet row or log byte offset - means
+    each poll reads only events added since the previous one. Each event needs
+    a Donor ID and an event name matching one of OUTREACH_STAGES. If the
+    source shrinks under the cursor (log truncated or rotated, sheet rows
+    deleted) the store starts over from the top of the source.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self.version = 0
+        self._frame = pd.DataFrame(columns=["Donor ID", "Outreach Status", "Last Outreach"])
+        self._reset()
+
+    def _reset(self):
+        self._cursor = None
+        self._header = None
+        self._inode = None
+        self._head = b""  # first bytes of the log, to spot a rewrite that reused the inode
+        self._stage = {}  # donor id -> furthest stage rank
+        self._last_event = {}  # donor id -> timestamp of latest event
+        self._restarted = True  # rebuild the frame even if no events follow
+
+    def _read_sheet(self, sheet_id):
+        client = connect_to_sheets()
+        if not client:
+            return []
+        sheet = client.open_by_key(sheet_id).sheet1
+        if self._header is None:
+            self._header = sheet.row_values(1)
+            self._cursor = 2
+        if not self._header:
+            self._header = None
+            return []
+        last_col = rowcol_to_a1(1, len(self._header)).rstrip("0123456789")
+        rows = sheet.get(f"A{self._cursor}:{last_col}")
+        if not rows and self._cursor > 2 and len(sheet.col_values(1)) < self._cursor - 1:
+            # Rows were deleted above the cursor: read the sheet again from the top
+            self._reset()
+            return self._read_sheet(sheet_id)
+        self._cursor += len(rows)
+        return [dict(zip(self._header, row)) for row in rows if any(row)]
+
+    def _read_log(self, path):
+        try:
+            stat = os.stat(path)
+            with open(path, "rb") as f:
+                head = f.read(256)
+        except FileNotFoundError:
+            return []
+        if self._inode is not None and (stat.st_ino != self._inode or stat.st_size < self._cursor
+                                        or not head.startswith(self._head)):
+            # Log rotated, truncated or rewritten: read the new file from the start
+            self._reset()
+        self._inode = stat.st_ino
+        self._head = head
+        records, self._cursor = read_jsonl_since(path, self._cursor or 0)
+        return records
+
+    def poll(self, force=False):
+        """Read any new events and fold them into per-donor status"""
+        with self._lock:
+            if not force and time.time() - self._last_poll < POLL_INTERVAL:
+                return
+            self._last_poll = time.time()
+
+            if get_setting("DIANA_EVENTS_LOG"):
+                events = self._read_log(get_setting("DIANA_EVENTS_LOG"))
+            elif get_setting("DIANA_SHEET_ID"):
+                events = self._read_sheet(get_setting("DIANA_SHEET_ID"))
+            else:
+                events = []
+
+            changed, self._restarted = self._restarted, False
+            for event in events:
+                donor_id = str(event.get("Donor ID") or event.get("donor_id") or "")
+                rank = STAGE_RANK.get(str(event.get("Event") or event.get("event") or "").strip().lower())
+                if not donor_id or rank is None:
+                    continue
+                if rank > self._stage.get(donor_id, -1):
+                    self._stage[donor_id] = rank
+                self._last_event[donor_id] = event.get("Timestamp") or event.get("timestamp") or ""
+                changed = True
+
+            if changed:
+                self.version += 1
+                self._frame = pd.DataFrame({
+                    "Donor ID": list(self._stage),
+                    "Outreach Status": pd.Categorical(
+                        [OUTREACH_STAGES[rank] for rank in self._stage.values()],
+                        categories=OUTREACH_STAGES, ordered=True
+                    ),
+                    "Last Outreach": [self._last_event.get(donor_id, "") for donor_id in self._stage],
+                })
+
+    def status_frame(self):
+        with self._lock:
+            return self._frame
+
+@st.cache_resource
+def get_outreach_store():
+    """Process-wide DIANA outreach event store"""
+    return OutreachEventStore()
+
+def load_outreach_status():
+    """Poll DIANA for new events and return (version, per-donor status frame)"""
+    store = get_outreach_store()
+    try:
+        store.poll()
+    except Exception as e:
+        st.error(f"❌ Error loading DIANA outreach events: {e}")
+    return store.version, store.status_frame()
+
+@st.cache_resource(max_entries=2)
+def _merge_outreach(snapshot, version, _leads, _status):
+    """Left-join outreach status onto leads; re-run only when either side changes"""
+    id_col = "Donor ID" if "Donor ID" in _leads.columns else "Lead ID"
+    # Sheet IDs may come back numeric; join on their text form
+    keys = _leads[id_col].astype(str).rename("_join_key")
+    status = _status.rename(columns={"Donor ID": "_join_key"})
+    merged = _leads.join(keys).merge(status, on="_join_key", how="left", validate="many_to_one")
+    merged = merged.drop(columns="_join_key")
+    merged.index = _leads.index
+    merged.attrs = _leads.attrs
+    return merged
+
+def with_outreach_status(leads, outreach=None):
+    """Join per-donor outreach status onto the DAPHNE lead frame by Donor ID.
+
+    `outreach` is a (version, status frame) pair already loaded this rerun,
+    e.g. the "diana.outreach" source; it is polled here when omitted.
+    """
+    if leads.empty or not ({"Donor ID", "Lead ID"} & set(leads.columns)):
+        return leads
+    version, status = outreach or load_outreach_status()
+    return _merge_outreach(snapshot_id(leads), version, leads, status)
+
+def get_outreach_funnel(lead_count, approved_count, outreach=None):
+    """Funnel counts: leads -> approved -> each outreach stage (cumulative)"""
+    _, status = outreach or load_outreach_status()
+    reached = status["Outreach Status"].value_counts().reindex(OUTREACH_STAGES, fill_value=0)
+    # Anyone who replied was also sent, delivered and opened
+    cumulative = reached[::-1].cumsum()[::-1]
+    return {"Leads": lead_count, "Approved": approved_count, **{stage: int(cumulative[stage]) for stage in OUTREACH_STAGES}}
+
+# ========================================
+# REGISTRY
+# ========================================
+
+register(Agent(
+    key="diana",
+    name="DIANA",
+    icon="📧",
+    description="Marketing & Research Knowledge",
+    status=get_diana_status,
+    sources=[DataSource("diana.outreach", load_outreach_status)],
+))
@@ -0,0 +1,454 @@
+"""Concurrent-session load test for the command center dashboard.
+
+Drives many simulated sessions through Streamlit's AppTest against stubbed
+Google Sheets and n8n backends, all in one process so they share the
+st.cache_data / st.cache_resource caches like real sessions on one server.
+
+    python loadtest.py --sessions 12 --actions 20 --rows 5000
+    python loadtest.py --scenario approvals --sheets-latency 0.5 --json
+
+Peak memory is the process peak RSS unless --trace-malloc is given. With more
+than one scenario each runs in its own subprocess, so every RSS figure is that
+scenario's own high-water mark (interpreter and imports included) rather than
+the peak of everything run before it.
+
+AppTest is written for one run at a time: each run swaps process-global
+state (the Runtime singleton, a config.get_option override, st.secrets) in
+and back out. The harness pins all three for the whole load test instead
+(see concurrency_patches), so runs don't undo each other mid-flight. All
+sessions therefore share one mock Runtime and one set of secrets, which is
+all dashboard.py needs. Anything that raises inside a session is counted as
+an error for that interaction and the session carries on, so one bad rerun
+can't abort the report; the first few tracebacks' summaries are listed
+under "failures". Latency percentiles are reproducible for a given --seed,
+--sessions and stub latencies, within scheduling noise.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from gspread.utils import a1_to_rowcol as rowcol_from_a1
+
+import contextlib
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.util import build_mock_config_get_option
+
+from activity import get_activity_log
+from core import get_approval_ledger, get_sheets_manager
+from shared_cache import get_shared_backend
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard.py")
+PAGES = ["Dashboard Overview", "Approve Leads", "Manage Tasks"]
+
+# ========================================
+# STUB BACKENDS
+# ========================================
+
+class BackendStats:
+    """Thread-safe counters for calls made to the stubbed backends"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def hit(self, name):
+        with self._lock:
+            self.calls[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self.calls = Counter()
+
+def make_daphne_rows(n):
+    now = datetime.now()
+    orgs = ["City of Springfield", "Grace Church", "Lincoln High School", "Acme Services LLC", "Helping Hands Foundation"]
+    rows = []
+    for i in range(n):
+        org = random.choice(orgs)
+        email = f"prospect{i}@example{i % 50}.org"
+        rows.append({
+            "Donor ID": f"DON-{i:06d}",
+            "Name": f"Prospect {i}",
+            "Email": email,
+            "Organization": org,
+            "name": f"Prospect {i}",
+            "email": email,
+            "organization": org,
+            "Status": random.choice(["New", "Qualified", "Contacted"]),
+            "timestamp": (now - timedelta(minutes=random.randint(0, 60 * 24 * 90))).isoformat(),
+        })
+    return rows
+
+def make_opsi_rows(n):
+    today = date.today()
+    return [{
+        "Task ID": f"OPSI-{i:05d}",
+        "Task Title": f"Task {i}",
+        "Task Type": random.choice(["RFP Submission", "Contract Renewal", "Audit", "Compliance Report"]),
+        "Status ": random.choice(["New", "In Progress", "Completed", "On Hold"]),
+        "Priority ": random.choice(["High", "Medium", "Low"]),
+        "Assigned To": random.choice(["Alex", "Sam", "Jordan", "Taylor"]),
+        "Deadline Date": str(today + timedelta(days=random.randint(-30, 60))),
+        "Notes": "",
+    } for i in range(n)]
+
+class StubWorksheet:
+    def __init__(self, name, rows, stats, latency):
+        self.name = name
+        self.rows = rows
+        self.stats = stats
+        self.latency = latency
+
+    def get_all_records(self):
+        self.stats.hit(f"sheets.{self.name}.get_all_records")
+        time.sleep(self.latency)
+        return [dict(row) for row in self.rows]
+
+    def _cell(self, a1):
+        row, col = rowcol_from_a1(a1)
+        header = list(self.rows[0])[col - 1]
+        return str(self.rows[row - 2][header])
+
+    def batch_get(self, ranges, **kwargs):
+        self.stats.hit(f"sheets.{self.name}.batch_get")
+        time.sleep(self.latency)
+        return [[[self._cell(a1)]] for a1 in ranges]
+
+    def col_values(self, col):
+        self.stats.hit(f"sheets.{self.name}.col_values")
+        time.sleep(self.latency)
+        header = list(self.rows[0])[col - 1]
+        return [header] + [str(row[header]) for row in self.rows]
+
+    def batch_update(self, data, **kwargs):
+        self.stats.hit(f"sheets.{self.name}.batch_update")
+        time.sleep(self.latency)
+        return {}
+
+class StubSpreadsheet:
+    def __init__(self, worksheet):
+        self.sheet1 = worksheet
+
+class StubSheetsClient:
+    def __init__(self, sheets, stats):
+        self.sheets = sheets
+        self.stats = stats
+
+    def open_by_key(self, key):
+        self.stats.hit("sheets.open_by_key")
+        return StubSpreadsheet(self.sheets[key])
+
+class StubResponse:
+    status_code = 200
+
+    def json(self):
+        return {"success": True}
+
+def stub_webhook(stats, latency):
+    def post(url, json=None, timeout=None):
+        stats.hit(f"webhook.{url.rstrip('/').rsplit('/', 1)[-1]}")
+        time.sleep(latency)
+        return StubResponse()
+    return post
+
+def install_stubs(args, stats, secrets):
+    """Patch gspread/google-auth/requests so the app talks to in-memory backends"""
+    sheets = {
+        "daphne-sheet": StubWorksheet("daphne", make_daphne_rows(args.rows), stats, args.sheets_latency),
+        "opsi-sheet": StubWorksheet("opsi", make_opsi_rows(args.tasks), stats, args.sheets_latency),
+    }
+
+    def authorize(credentials, **kwargs):
+        stats.hit("sheets.authorize")
+        return StubSheetsClient(sheets, stats)
+
+    patches = [
+        *concurrency_patches(secrets),
+        shared_script_cache_patch(),
+        mock.patch("google.oauth2.service_account.Credentials.from_service_account_info", return_value=mock.Mock(expiry=None)),
+        mock.patch("gspread.authorize", side_effect=authorize),
+        mock.patch("requests.post", side_effect=stub_webhook(stats, args.webhook_latency)),
+    ]
+    for patch in patches:
+        patch.start()
+    return patches
+
+def concurrency_patches(secrets):
+    """Let AppTest instances run concurrently.
+
+    Each AppTest run installs a mock Runtime singleton and clears it when it
+    finishes, which breaks any other session still running; remember the last
+    installed runtime and keep serving it instead of raising. Each run also
+    patches config.get_option (to turn on global.appTest, which records the
+    widget metadata AppTest reads back) and swaps st.secrets, restoring both
+    on exit - with overlapping runs, one run's exit undoes the other's
+    patch, dropping widget metadata (KeyError: '$$ID-...') or secrets. Pin
+    both for the whole load test and make the per-run patch a no-op.
+    """
+    last = {"runtime": None}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        if last["runtime"] is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+
+    def exists(cls):
+        return cls._instance is not None or last["runtime"] is not None
+
+    pinned_secrets = Secrets()
+    pinned_secrets._secrets = secrets
+
+    return [
+        mock.patch.object(Runtime, "instance", classmethod(instance)),
+        mock.patch.object(Runtime, "exists", classmethod(exists)),
+        mock.patch.object(config, "get_option", build_mock_config_get_option({"global.appTest": True})),
+        mock.patch("streamlit.testing.v1.app_test.patch_config_options", lambda overrides: contextlib.nullcontext()),
+        mock.patch.object(st, "secrets", pinned_secrets),
+    ]
+
+def shared_script_cache_patch():
+    """Compile dashboard.py once for all sessions, as a real server does.
+
+    AppTest builds a fresh ScriptCache per run, so every rerun would re-parse
+    the script (and concurrent parses are not thread-safe on older Pythons).
+    """
+    shared = ScriptCache()
+    lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def shared_get_bytecode(self, script_path):
+        with lock:
+            return get_bytecode(shared, script_path)
+
+    return mock.patch.object(ScriptCache, "get_bytecode", shared_get_bytecode)
+
+def stub_secrets(ledger_dir, opsi_write_mode):
+    secrets = {key: "stub" for key in (
+        "type", "project_id", "private_key_id", "private_key", "client_email", "client_id",
+        "auth_uri", "token_uri", "auth_provider_x509_cert_url", "client_x509_cert_url",
+    )}
+    secrets.update({
+        "DAPHNE_SHEET_ID": "daphne-sheet",
+        "OPSI_SHEET_ID": "opsi-sheet",
+        "APPROVAL_LEDGER_PATH": os.path.join(ledger_dir, "approval_ledger.jsonl"),
+        "ACTIVITY_LOG_PATH": os.path.join(ledger_dir, "activity_log.jsonl"),
+        "SHARED_CACHE_URL": "sqlite:///" + os.path.join(ledger_dir, "shared_cache.sqlite"),
+        "OPSI_WRITE_MODE": opsi_write_mode,
+    })
+    return secrets
+
+# ========================================
+# SIMULATED SESSIONS
+# ========================================
+
+class Session:
+    """One simulated user driving its own AppTest instance"""
+
+    def __init__(self, timeout):
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)  # secrets are pinned process-wide
+        self.latencies = []
+        self.errors = 0
+        self.failures = []
+
+    def run(self):
+        start = time.perf_counter()
+        self.at.run()
+        self.latencies.append(time.perf_counter() - start)
+        self.errors += len(self.at.exception)
+
+    def goto(self, page):
+        if self.at.sidebar.radio:
+            self.at.sidebar.radio[0].set_value(page)
+        self.run()
+
+    def widget(self, kind, key):
+        matches = [w for w in getattr(self.at, kind) if w.key == key]
+        return matches[0] if matches else None
+
+    def search(self):
+        page = random.choice(["Approve Leads", "Manage Tasks"])
+        self.goto(page)
+        key = "search_approve_filter" if page == "Approve Leads" else "task_search"
+        box = self.widget("text_input", key)
+        if box is not None:
+            box.input(random.choice(["church", "city", "school", "1", "alex", "audit"]))
+            self.run()
+
+    def select_all(self):
+        self.goto("Approve Leads")
+        box = self.widget("checkbox", "select_all_checkbox")
+        if box is not None:
+            box.check()
+            self.run()
+
+    def approve(self):
+        self.goto("Approve Leads")
+        rows = [c for c in self.at.checkbox if c.key and c.key.startswith("prospect_check_") and not c.disabled]
+        for box in random.sample(rows, min(3, len(rows))):
+            box.check()
+        self.run()
+        button = self.widget("button", "approve_bottom")
+        if button is not None and not button.disabled:
+            button.click()
+            self.run()
+
+    def navigate(self):
+        self.goto(random.choice(PAGES))
+
+SCENARIOS = {
+    "navigation": ["navigate"],
+    "search": ["search"],
+    "select_all": ["select_all"],
+    "approvals": ["approve"],
+    "mixed": ["navigate", "navigate", "search", "select_all", "approve"],
+}
+
+def drive_session(scenario, args):
+    session = Session(args.timeout)
+    actions = ["run"] + [random.choice(SCENARIOS[scenario]) for _ in range(args.actions)]
+    for action in actions:
+        try:
+            getattr(session, action)()
+        except Exception as e:
+            # A harness-side failure counts against this interaction only
+            session.errors += 1
+            frame = traceback.extract_tb(e.__traceback__)[-1]
+            session.failures.append(f"{action}: {type(e).__name__}: {e} ({os.path.basename(frame.filename)}:{frame.lineno})")
+    return session
+
+# ========================================
+# REPORTING
+# ========================================
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def run_scenario(scenario, secrets, args, stats):
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    for singleton in (get_sheets_manager, get_approval_ledger, get_activity_log, get_shared_backend):
+        singleton.clear()
+    # Start each scenario cold across "workers" too
+    shared_cache_path = secrets["SHARED_CACHE_URL"][len("sqlite:///"):]
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(shared_cache_path + suffix):
+            os.remove(shared_cache_path + suffix)
+    stats.reset()
+    if args.trace_malloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        sessions = list(pool.map(lambda _: drive_session(scenario, args), range(args.sessions)))
+
+    wall = time.perf_counter() - started
+    if args.trace_malloc:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    else:
+        peak = peak_rss_bytes()
+
+    latencies = [lat for session in sessions for lat in session.latencies]
+    return {
+        "scenario": scenario,
+        "sessions": args.sessions,
+        "reruns": len(latencies),
+        "errors": sum(session.errors for session in sessions),
+        "wall_s": round(wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_mem_mb": round(peak / 1024 / 1024, 1),
+        "backend_calls": dict(sorted(stats.calls.items())),
+        "failures": [failure for session in sessions for failure in session.failures][:5],
+    }
+
+def run_scenario_subprocess(scenario):
+    """Run one scenario in a fresh interpreter and return its result"""
+    command = [sys.executable, os.path.abspath(__file__), *sys.argv[1:], "--scenario", scenario, "--json"]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+    if completed.returncode != 0:
+        sys.exit(f"scenario {scenario} exited with status {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def print_report(results):
+    print(f"{'scenario':<12} {'reruns':>7} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    for r in results:
+        print(f"{r['scenario']:<12} {r['reruns']:>7} {r['errors']:>6} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['peak_mem_mb']:>8}")
+    print()
+    for r in results:
+        calls = ", ".join(f"{name}={count}" for name, count in r["backend_calls"].items()) or "none"
+        print(f"{r['scenario']} backend calls: {calls}")
+        for failure in r["failures"]:
+            print(f"{r['scenario']} failure: {failure}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for dashboard.py")
+    parser.add_argument("--scenario", choices=["all", *SCENARIOS], default="all")
+    parser.add_argument("--sessions", type=int, default=12, help="concurrent simulated sessions")
+    parser.add_argument("--actions", type=int, default=10, help="interactions per session")
+    parser.add_argument("--rows", type=int, default=500, help="DAPHNE rows in the stub sheet")
+    parser.add_argument("--tasks", type=int, default=200, help="OPSI rows in the stub sheet")
+    parser.add_argument("--sheets-latency", type=float, default=0.2, help="seconds per stubbed Sheets read")
+    parser.add_argument("--webhook-latency", type=float, default=0.1, help="seconds per stubbed n8n call")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun AppTest timeout")
+    parser.add_argument("--opsi-write-mode", choices=["webhook", "direct"], default="webhook")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="report peak Python heap per scenario via tracemalloc (slows reruns) instead of process peak RSS")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    stats = BackendStats()
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+
+    if len(scenarios) > 1:
+        results = [run_scenario_subprocess(name) for name in scenarios]
+    else:
+        with tempfile.TemporaryDirectory() as ledger_dir:
+            secrets = stub_secrets(ledger_dir, args.opsi_write_mode)
+            patches = install_stubs(args, stats, secrets)
+            try:
+                results = [run_scenario(name, secrets, args, stats) for name in scenarios]
+            finally:
+                for patch in patches:
+                    patch.stop()
+
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+    else:
+        print_report(results)
+
+if __name__ == "__main__":
+    main()
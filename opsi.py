@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-from utils import load_opsi_data
+import bisect
+from agents import Agent, DataSource, register, LOCAL_CACHE_TTL
+from core import DeadlineIndex, task_metrics
+from utils import load_opsi_data, snapshot_id
 
 def get_opsi_status():
     """Return OPSI agent status"""
@@ -12,3 +15,97 @@ def load_opsi_tasks():
         return load_opsi_data()
     except:
         return pd.DataFrame()
+
+TASKS = DataSource("opsi.tasks", load_opsi_tasks, ttl=LOCAL_CACHE_TTL)
+
+# ========================================
+# DEADLINE INDEX
+# ========================================
+
+@st.cache_resource(max_entries=2)
+def _build_deadline_index(snapshot, _df):
+    return DeadlineIndex(_df)
+
+def get_deadline_index():
+    """Get the deadline index for the current OPSI snapshot"""
+    df = TASKS.load()
+    return _build_deadline_index(snapshot_id(df), df)
+
+# ========================================
+# TASK ID INDEX
+# ========================================
+
+MAX_TASK_CANDIDATES = 50
+
+class TaskIdIndex:
+    """Task ID lookup and type-ahead search over one OPSI snapshot.
+
+    Lookups go through a Task ID -> row dict. Search walks a sorted list of
+    lowercased search keys from the bisected prefix position, so it touches at
+    most `limit` matches whatever the task count. Each ID is keyed in full and
+    by its separator-delimited segments ("OPSI-0042" also matches "0042" and
+    "42").
+    """
+
+    def __init__(self, df, task_id_col, task_title_col):
+        self._df = df
+        task_ids = df[task_id_col].astype(str) if task_id_col in df.columns else pd.Series(dtype=str)
+        titles = df[task_title_col].astype(str) if task_title_col in df.columns else task_ids
+
+        self._positions = {task_id: pos for pos, task_id in enumerate(task_ids)}
+        self._labels = {task_id: f"{task_id} - {title}" for task_id, title in zip(task_ids, titles)}
+
+        keys = set()
+        for task_id in self._positions:
+            lowered = task_id.lower()
+            keys.add((lowered, task_id))
+            for segment in lowered.replace("_", "-").split("-")[1:]:
+                keys.update({(segment, task_id), (segment.lstrip("0"), task_id)})
+        self._keys = sorted(key for key in keys if key[0])
+
+    def get(self, task_id):
+        """Return the task row for a Task ID, or None"""
+        pos = self._positions.get(str(task_id))
+        return None if pos is None else self._df.iloc[pos]
+
+    def label(self, task_id):
+        return self._labels.get(str(task_id), str(task_id))
+
+    def search(self, prefix, limit=MAX_TASK_CANDIDATES):
+        """Return up to `limit` Task IDs that start with (or have a segment starting with) prefix"""
+        prefix = prefix.strip().lower()
+        matches = {}
+        for key, task_id in self._keys[bisect.bisect_left(self._keys, (prefix, "")):]:
+            if not key.startswith(prefix):
+                break
+            matches[task_id] = None
+            if len(matches) == limit:
+                break
+        return list(matches)
+
+@st.cache_resource(max_entries=2)
+def _build_task_id_index(snapshot, _df, task_id_col, task_title_col):
+    return TaskIdIndex(_df, task_id_col, task_title_col)
+
+def get_task_id_index(df, task_id_col, task_title_col):
+    """Get the Task ID index for an OPSI snapshot"""
+    return _build_task_id_index(snapshot_id(df), df, task_id_col, task_title_col)
+
+# ========================================
+# REGISTRY
+# ========================================
+
+def opsi_metrics(data):
+    """Headline task counts for the overview"""
+    df = data["opsi.tasks"]
+    return {"Pending Tasks": task_metrics(df, _build_deadline_index(snapshot_id(df), df))["pending"]}
+
+register(Agent(
+    key="opsi",
+    name="OPSI",
+    icon="📋",
+    description="Operations & Policy System",
+    status=get_opsi_status,
+    sources=[TASKS],
+    metrics=opsi_metrics,
+))
@@ -0,0 +1,95 @@
+import streamlit as st
+import pandas as pd
+import cProfile
+import os
+import pstats
+from datetime import datetime
+from config import get_setting
+
+# ========================================
+# ON-DEMAND PAGE PROFILER
+# ========================================
+# Add ?profile=1 to the URL to capture the next rerun of the current page, or
+# set the PROFILE_PAGES secret to capture every rerun. Each capture is saved
+# as a .prof file (open with snakeviz or `python -m pstats`) and summarized in
+# the sidebar. With neither set, a rerun only pays for the two lookups below.
+
+PROFILE_TOP_N = 15
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def profiling_requested():
+    """True when this rerun should be profiled"""
+    return st.query_params.get("profile") == "1" or str(get_setting("PROFILE_PAGES", "")).lower() in ("1", "true", "yes")
+
+def profile_active():
+    """True while this rerun is being captured"""
+    return "_active_profile" in st.session_state
+
+def start_page_profile():
+    """Start profiling this rerun if requested"""
+    # A rerun cut short by st.rerun() or an exception never reached
+    # finish_page_profile; save what it captured now
+    if "_active_profile" in st.session_state:
+        _save_profile(st.session_state.pop("_active_profile"))
+
+    if not profiling_requested():
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another session's capture is running (one profiler per process on Python 3.12+)
+        st.session_state.last_profile = {"error": "Another profile capture is running; try again shortly."}
+        return
+    st.session_state["_active_profile"] = profiler
+
+def finish_page_profile():
+    """Stop profiling, save the capture and show the hot-function summary"""
+    if "_active_profile" in st.session_state:
+        _save_profile(st.session_state.pop("_active_profile"))
+        if st.query_params.get("profile") == "1":
+            del st.query_params["profile"]  # one capture per request
+    if "last_profile" in st.session_state:
+        show_profile_summary(st.session_state.last_profile)
+
+def _save_profile(profiler):
+    profiler.disable()
+    page = st.session_state.get("selected_page", "Dashboard Overview")
+    profile_dir = get_setting("PROFILE_DIR", "data/profiles")
+    os.makedirs(profile_dir, exist_ok=True)
+    slug = page.lower().replace(" ", "-")
+    path = os.path.join(profile_dir, f"{slug}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(path)
+    st.session_state.last_profile = {"path": path, "page": page, "stats": profile_rows(profiler)}
+
+def profile_rows(profiler):
+    """Per-function rows (calls, own and cumulative seconds) from a finished profile"""
+    rows = []
+    for (filename, line, func), (_, calls, own, cumulative, _) in pstats.Stats(profiler).stats.items():
+        in_app = filename.startswith(APP_DIR)
+        location = os.path.relpath(filename, APP_DIR) if in_app else os.path.basename(filename)
+        rows.append({
+            "Function": f"{location}:{line}({func})" if line else func,
+            "Calls": calls,
+            "Own s": round(own, 4),
+            "Cum s": round(cumulative, 4),
+            "App": in_app,
+        })
+    return pd.DataFrame(rows)
+
+def show_profile_summary(profile):
+    """Sidebar table of the hottest functions in the last capture"""
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🔬 Profile")
+        if "error" in profile:
+            st.warning(profile["error"])
+            return
+        stats = profile["stats"]
+        view = st.radio("Rank by:", ["Own time", "App code (cumulative)"], horizontal=True, key="profile_view")
+        if view == "Own time":
+            top = stats.nlargest(PROFILE_TOP_N, "Own s")
+        else:
+            top = stats[stats["App"]].nlargest(PROFILE_TOP_N, "Cum s")
+        st.dataframe(top.drop(columns="App"), hide_index=True, width="stretch")
+        st.caption(f"{profile['page']} • total {stats['Own s'].sum():.2f}s • saved to `{profile['path']}`")
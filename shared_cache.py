@@ -0,0 +1,281 @@
+import pandas as pd
+import pyarrow as pa
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+from config import get_setting, process_singleton
+
+# ========================================
+# SHARED CACHE BACKENDS
+# ========================================
+# One sheet fetch serves every Streamlit worker: the first worker to find an
+# entry missing or stale takes a short lease, fetches, and stores the frame;
+# the others wait for it instead of hitting Google Sheets themselves.
+#
+# Backends (SHARED_CACHE_URL secret):
+#   sqlite:///data/shared_cache.sqlite   default, one file shared by local workers
+#   arrow:///data/shared_cache           memory-mapped Arrow IPC files per key
+#   redis://host:6379/0                  Redis or any Redis-compatible server
+#   none                                 no sharing: entries live in this process only
+#
+# This saves Sheets round trips, not worker memory: each worker still decodes
+# its own copy of the frame and keeps it in st.cache_data for LOCAL_CACHE_TTL
+# (agents.py), so per worker that is one pickled copy per sheet plus the frames
+# its running sessions hold. That TTL is well below the shared one, which
+# bounds staleness at shared TTL + LOCAL_CACHE_TTL. Every frame handed out has
+# been through the Arrow encoding, so column dtypes are the same whichever
+# worker (or fallback path) did the fetch, and carries the shared entry's
+# store time in attrs["stored_at"].
+
+LEASE_SECONDS = 30  # how long one worker may hold a fetch before others give up waiting
+
+class SQLiteBackend:
+    """Cache entries and fetch leases in a local SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, stored_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        with self._connect() as conn:
+            return conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+
+    def set(self, key, value):
+        stored_at = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, stored_at))
+        return stored_at
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def acquire(self, key, seconds):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires < ?", (key, now))
+            return conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?)", (key, now + seconds)).rowcount == 1
+
+    def release(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+class MemoryBackend:
+    """Entries and leases in a dict; shares nothing across processes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._leases = {}
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.time())
+        return self._entries[key][1]
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def acquire(self, key, seconds):
+        now = time.time()
+        with self._lock:
+            if self._leases.get(key, 0) > now:
+                return False
+            self._leases[key] = now + seconds
+            return True
+
+    def release(self, key):
+        self._leases.pop(key, None)
+
+class ArrowFileBackend:
+    """One Arrow IPC file per key, read through a memory map (no extra copy before decoding)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix=".arrow"):
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            with pa.memory_map(path) as source:
+                return source.read_buffer(), stored_at
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        tmp_path = self._path(key, f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+        return os.path.getmtime(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def acquire(self, key, seconds):
+        lease = self._path(key, ".lease")
+        try:
+            if time.time() - os.path.getmtime(lease) > seconds:
+                os.remove(lease)  # holder died without releasing
+        except FileNotFoundError:
+            pass
+        try:
+            os.close(os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def release(self, key):
+        try:
+            os.remove(self._path(key, ".lease"))
+        except FileNotFoundError:
+            pass
+
+class RedisBackend:
+    """Entries and leases in Redis; any client with get/set/delete/pipeline works (e.g. fakeredis)"""
+
+    def __init__(self, client, prefix="agent-workforce:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value, stored_at = self.client.mget(f"{self.prefix}{key}", f"{self.prefix}{key}:stored_at")
+        return None if value is None else (value, float(stored_at or 0))
+
+    def set(self, key, value):
+        stored_at = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(f"{self.prefix}{key}", value)
+        pipe.set(f"{self.prefix}{key}:stored_at", stored_at)
+        pipe.execute()
+        return stored_at
+
+    def delete(self, key):
+        self.client.delete(f"{self.prefix}{key}", f"{self.prefix}{key}:stored_at")
+
+    def acquire(self, key, seconds):
+        return bool(self.client.set(f"{self.prefix}{key}:lease", 1, nx=True, ex=int(seconds)))
+
+    def release(self, key):
+        self.client.delete(f"{self.prefix}{key}:lease")
+
+def make_backend(url):
+    """Build a backend from a SHARED_CACHE_URL"""
+    if not url or url == "none":
+        return MemoryBackend()
+    parsed = urlparse(url)
+    # sqlite:///relative/path or sqlite:////absolute/path, as in SQLAlchemy URLs
+    path = parsed.netloc + parsed.path if parsed.netloc else parsed.path[1:]
+    if parsed.scheme == "sqlite":
+        return SQLiteBackend(path)
+    if parsed.scheme == "arrow":
+        return ArrowFileBackend(path)
+    if parsed.scheme in ("redis", "rediss"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("SHARED_CACHE_URL uses Redis but the 'redis' package is not installed")
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f"Unsupported SHARED_CACHE_URL scheme: {parsed.scheme}")
+
+@process_singleton
+def get_shared_backend():
+    """Process-wide shared cache backend"""
+    return make_backend(get_setting("SHARED_CACHE_URL", "sqlite:///data/shared_cache.sqlite"))
+
+# ========================================
+# FRAME SERIALIZATION
+# ========================================
+
+def frame_to_bytes(df):
+    """Serialize a frame as an Arrow IPC stream.
+
+    Sheets columns can mix numbers and text, which Arrow can't type; those
+    columns are stored as text.
+    """
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        mixed = {col: df[col].astype(str) for col in df.columns if pd.api.types.is_object_dtype(df[col])}
+        table = pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def frame_from_bytes(data):
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+def _decode(data, stored_at):
+    df = frame_from_bytes(data)
+    df.attrs["stored_at"] = stored_at
+    return df
+
+def _fetch_normalized(fetch):
+    """Fetch a frame and give it the dtypes it would have after a trip through the cache"""
+    return _decode(frame_to_bytes(fetch()), time.time())
+
+# ========================================
+# SHARED FETCH
+# ========================================
+
+def _backend_call(method, *args):
+    """Run a backend operation; None when the shared store is unavailable"""
+    try:
+        return method(*args)
+    except Exception:
+        return None
+
+def shared_fetch(key, ttl, fetch):
+    """Return a fresh frame for `key` from the shared cache, fetching at most once across workers.
+
+    If the shared store is unreachable this degrades to a plain fetch.
+    """
+    backend = get_shared_backend()
+    deadline = time.time() + LEASE_SECONDS
+    while True:
+        entry = _backend_call(backend.get, key)
+        if entry is not None and time.time() - entry[1] < ttl:
+            df = _backend_call(_decode, entry[0], entry[1])
+            if df is not None:
+                return df
+
+        acquired = _backend_call(backend.acquire, key, LEASE_SECONDS)
+        if acquired is None:
+            return _fetch_normalized(fetch)
+        if acquired:
+            try:
+                df = fetch()
+                data = frame_to_bytes(df)
+                stored_at = _backend_call(backend.set, key, data) if not df.empty else None
+                return _decode(data, stored_at or time.time())
+            finally:
+                _backend_call(backend.release, key)
+
+        if time.time() > deadline:
+            return _fetch_normalized(fetch)  # lease holder is stuck; don't keep this user waiting
+        time.sleep(0.2)
+
+def invalidate_shared(*keys):
+    """Drop shared entries so the next load refetches from Sheets"""
+    backend = get_shared_backend()
+    for key in keys:
+        _backend_call(backend.delete, key)
@@ -0,0 +1,66 @@
+import streamlit as st
+import pandas as pd
+
+# ========================================
+# WINDOWED TABLES
+# ========================================
+
+PAGE_SIZES = [25, 50, 100, 200]
+MAX_VISIBLE_ROWS = 200  # hard cap on rows sent to the browser per render
+
+def windowed_table(df, key, columns=None, page_size=50):
+    """Render one page of a frame, projecting and sorting on the server.
+
+    Only the chosen columns of the visible page are serialized, so the payload
+    stays bounded by MAX_VISIBLE_ROWS x columns however large the sheet gets.
+    `columns` sets the default projection (all columns when omitted).
+    """
+    if df.empty:
+        return
+
+    all_columns = list(df.columns)
+    default_columns = [c for c in (columns or all_columns) if c in all_columns]
+
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+
+    with col1:
+        visible_columns = st.multiselect(
+            "Columns:",
+            all_columns,
+            default=default_columns,
+            key=f"{key}_columns"
+        ) or default_columns
+
+    with col2:
+        sort_col = st.selectbox("Sort by:", ["(sheet order)"] + all_columns, key=f"{key}_sort")
+
+    with col3:
+        descending = st.toggle("Desc", key=f"{key}_desc")
+
+    with col4:
+        rows_per_page = st.selectbox(
+            "Rows:",
+            [size for size in PAGE_SIZES if size <= MAX_VISIBLE_ROWS],
+            index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 0,
+            key=f"{key}_page_size"
+        )
+
+    total = len(df)
+    pages = max(1, -(-total // rows_per_page))
+    page = st.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    page = min(page, pages)
+
+    start = (page - 1) * rows_per_page
+    stop = min(start + rows_per_page, total)
+
+    if sort_col in all_columns:
+        # Sort only the key column, then take the window's positions from it.
+        # Sheets mix numbers and text in one column, so compare object columns as text
+        order = df[sort_col].astype(str) if pd.api.types.is_object_dtype(df[sort_col]) else df[sort_col]
+        positions = order.reset_index(drop=True).sort_values(ascending=not descending, kind="stable").index[start:stop]
+        window = df.iloc[positions]
+    else:
+        window = (df.iloc[::-1] if descending else df).iloc[start:stop]
+
+    st.dataframe(window[visible_columns], width="stretch", hide_index=True)
+    st.caption(f"Rows {start + 1:,}–{stop:,} of {total:,}")